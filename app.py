@@ -1,16 +1,74 @@
 # app.py
+import time
+
 import streamlit as st
 import pandas as pd
-import json
-import os
 
+from scripts.bars import INTERVALS, is_intraday
 from scripts.data_fetcher import fetch_and_save_stock_data
-from scripts.analyzer import detect_all_anomalies
+from scripts.analyzer import PROMPT_DEFAULTS, apply_thresholds, compute_scores
+from scripts.history_store import clamp_period
+from scripts.jobs import JobRunner
 from scripts.main import fetch_news_for_anomalies
-from scripts.visualize import generate_visualization
+from scripts.metrics import get_recorder, profiling, summarize
+from scripts.visualize import anomaly_keys, build_figure
 
 st.set_page_config(page_title="Stock Anomaly Detector", layout="wide")
 
+ROLLING_WINDOW = 5
+EXTREME_WINDOW = 3
+PERSISTENT_MIN_DAYS = 7
+
+
+# Seconds between refreshes while a background job is still running
+POLL_SECONDS = 1.0
+# Prices and scores are reused for this long after they were computed
+RESULTS_TTL = 3600
+
+
+# --- BACKGROUND JOBS ---
+# Fetching, scoring and news run on a shared thread pool so the page stays
+# responsive. Jobs are keyed by (ticker, period, interval) and by the anomaly
+# dates, so moving a threshold slider reuses the prices and precomputed scores
+# and only fetches headlines for dates not seen before. A finished analysis is
+# reused for RESULTS_TTL seconds after it completed, across sessions.
+@st.cache_resource
+def get_runner():
+    return JobRunner()
+
+
+# Profiling happens inside the jobs: cProfile only sees the thread it runs on,
+# and the work runs on the pool, not on the script thread that polls it.
+def analysis_job(job, ticker, period, interval, profile_mode=None):
+    with profiling(profile_mode, name=f"{ticker}-analysis") as profile:
+        job.update(stage="📥 Fetching stock data...")
+        df = fetch_and_save_stock_data(ticker, period=clamp_period(period, interval), interval=interval)
+        if df is None:
+            raise ValueError(f"No price data found for {ticker}.")
+        job.update(stage="🔍 Scoring anomalies...", progress=0.5, prices=df)
+        scores = compute_scores(df, config={
+            "rolling_window": ROLLING_WINDOW,
+            "extreme_window": EXTREME_WINDOW,
+            "persistent_min_days": PERSISTENT_MIN_DAYS,
+        })
+    job.update(profile=profile)
+    return {"scores": scores}
+
+
+def news_job(job, ticker, dates, api_key, profile_mode=None):
+    job.update(stage="📰 Fetching news for anomaly dates...", news={})
+    received = set()
+
+    def on_news(date, headlines):
+        received.add(date)
+        job.merge("news", {date: headlines})
+        job.update(progress=len(received) / max(len(dates), 1))
+
+    with profiling(profile_mode, name=f"{ticker}-news") as profile:
+        fetch_news_for_anomalies(ticker, list(dates), api_key=api_key, on_news=on_news)
+    job.update(profile=profile)
+
+
 # --- HEADER ---
 st.markdown("""
     <style>
@@ -35,10 +93,10 @@ st.sidebar.title("Configuration")
 
 ticker = st.sidebar.text_input("Stock Ticker", value="AAPL").upper()
 st.sidebar.markdown("### Thresholds")
-mad_threshold = st.sidebar.slider("1-Day Z Score (MAD)", 1.0, 5.0, 2.5)
-rolling_threshold = st.sidebar.slider("5-Day Trend Z", 1.0, 5.0, 2.0)
-extreme_threshold = st.sidebar.slider("3-Day Return Z", 1.0, 5.0, 2.5)
-persistent_threshold = st.sidebar.slider("7-Day Run Z", 0.1, 5.0, 0.5)
+mad_threshold = st.sidebar.slider("1-Day Z Score (MAD)", 1.0, 5.0, PROMPT_DEFAULTS["mad_threshold"])
+rolling_threshold = st.sidebar.slider("5-Day Trend Z", 1.0, 5.0, PROMPT_DEFAULTS["rolling_threshold"])
+extreme_threshold = st.sidebar.slider("3-Day Return Z", 1.0, 5.0, PROMPT_DEFAULTS["extreme_threshold"])
+persistent_threshold = st.sidebar.slider("7-Day Run Z", 0.1, 5.0, PROMPT_DEFAULTS["persistent_threshold"])
 
 # TIME SLIDER
 
@@ -59,6 +117,8 @@ selected_period_label = st.sidebar.select_slider(
     value="12M"
 )
 selected_period = period_map[selected_period_label]
+# Intraday bars only go back so far (see scripts/bars.py MAX_LOOKBACK); longer windows are shortened
+selected_interval = st.sidebar.selectbox("Bar interval", list(reversed(INTERVALS)))
 
 
 # API BUTTON
@@ -70,75 +130,142 @@ if not api_key:
     st.sidebar.warning("🔐 Please enter your News API key to fetch headlines.")
 
 
+# --- DIAGNOSTICS ---
+st.sidebar.markdown("### 🩺 Diagnostics")
+show_timings = st.sidebar.checkbox("Show stage timings", value=False)
+profile_label = st.sidebar.selectbox("Profile this run", ["Off", "cProfile", "tracemalloc"])
+profile_mode = {"Off": None, "cProfile": "cprofile", "tracemalloc": "tracemalloc"}[profile_label]
+
+
 # --- RUN BUTTON ---
+# The button starts (or reuses) a background analysis job; results are re-rendered
+# from the job on every rerun so threshold changes apply without pressing it again.
 if st.sidebar.button("🚀 Run Anomaly Detection"):
-    st.success(f"Running analysis for **{ticker}**...")
+    job = get_runner().submit(
+        analysis_job, ticker, selected_period, selected_interval, profile_mode, name=f"{ticker} analysis",
+        # A profiled run always executes rather than reusing unprofiled results
+        key=("analysis", ticker, selected_period, selected_interval, profile_mode), max_age=RESULTS_TTL,
+    )
+    st.session_state["run"] = {
+        "ticker": ticker, "period": selected_period, "interval": selected_interval,
+        "api_key": api_key, "profile_mode": profile_mode, "job": job.id,
+    }
+    st.session_state["pending"] = True
+
+
+def show_profile(title, profile):
+    """Render a job's Profile, if it was profiled."""
+    if profile is None or not profile.summary:
+        return
+    st.markdown(f"#### 🔬 {title} profile ({profile.mode})")
+    if profile.path:
+        st.caption(f"Full stats saved to {profile.path}")
+    st.code(profile.summary)
 
+
+def show_results(run):
+    """Render whatever the run's jobs have produced so far; returns True while any is still running."""
+    ticker = run["ticker"]
+    interval = run.get("interval", "1d")
+    intraday = is_intraday(interval)
+    runner = get_runner()
+
+    job = runner.get(run["job"])
+    if job is None:
+        st.warning("These results have expired. Press Run again.")
+        return False
+    analysis = job.snapshot()
+    if analysis["status"] == "error":
+        st.error(analysis["error"])
+        return False
+    if "scores" not in analysis["results"]:
+        st.progress(analysis["progress"], text=analysis["stage"])
+        return True
+
+    st.success(f"Showing analysis for **{ticker}**")
+    df = analysis["results"]["prices"]
     config = {
         "mad_threshold": mad_threshold,
-        "rolling_window": 5,
+        "rolling_window": ROLLING_WINDOW,
         "rolling_threshold": rolling_threshold,
-        "extreme_window": 3,
+        "extreme_window": EXTREME_WINDOW,
         "extreme_threshold": extreme_threshold,
-        "persistent_min_days": 7,
+        "persistent_min_days": PERSISTENT_MIN_DAYS,
         "persistent_threshold": persistent_threshold,
+        # Intraday windows and gaps count bars rather than calendar days
+        "gap_unit": "bars" if intraday else "days",
     }
 
-    # Fetch data
-    fetch_and_save_stock_data(ticker, period=selected_period)
-    df = pd.read_csv(f"data/{ticker}_history.csv", parse_dates=["Date"])
-    df.set_index("Date", inplace=True)
-
     # --- Detect anomalies ---
-    anomalies = detect_all_anomalies(df, config=config)
+    anomalies = apply_thresholds(analysis["results"]["scores"], config)
 
     # 1-day MAD anomalies
-    anomaly_dates = pd.to_datetime(anomalies["mad"].index, errors="coerce", utc=True).strftime("%Y-%m-%d").tolist()
+    anomaly_dates = anomaly_keys(anomalies["mad"].index, intraday)
 
     # 5-day rolling trend anomalies
-    trend_df = anomalies["rolling"].copy()
-    trend_df["AnomalyDate"] = pd.to_datetime(trend_df["AnomalyDate"], errors="coerce", utc=True)
-    trend_dates = trend_df["AnomalyDate"].dt.strftime("%Y-%m-%d").tolist()
+    trend_dates = anomaly_keys(anomalies["rolling"]["AnomalyDate"], intraday)
 
-    # 3-day extreme return anomalies
-    extreme_df = anomalies["extreme"].copy()
-    extreme_df["AnomalyDate"] = pd.to_datetime(extreme_df["AnomalyDate"], errors="coerce", utc=True)
-    extreme_dates = extreme_df["AnomalyDate"].dt.strftime("%Y-%m-%d").tolist()
+    # 3-day extreme return anomalies (naive timestamps in the price index's timezone)
+    extreme_dates = anomaly_keys(anomalies["extreme"]["AnomalyDate"], intraday, tz=df.index.tz)
 
     # 7-day persistent run anomalies
-    persistent_df = anomalies["persistent"].copy()
+    persistent_df = anomalies["persistent"]
     if not persistent_df.empty:
-        persistent_df["start_date"] = pd.to_datetime(persistent_df["start_date"], errors="coerce", utc=True)
-        persistent_dates = persistent_df["start_date"].dt.strftime("%Y-%m-%d").tolist()
+        persistent_dates = anomaly_keys(persistent_df["start_date"], intraday)
     else:
         persistent_dates = []
 
 
-    all_dates = sorted(set(anomaly_dates + trend_dates + extreme_dates + persistent_dates))
+    # Headlines are per day, so intraday bar keys collapse to their date
+    all_dates = tuple(sorted({d[:10] for d in anomaly_dates + trend_dates + extreme_dates + persistent_dates}))
 
-    with st.spinner("📰 Fetching news for anomaly dates..."):
-        news = fetch_news_for_anomalies(ticker, all_dates, api_key=api_key)
-        news_path = f"data/{ticker}_news.json"
-        with open(news_path, "w") as f:
-            json.dump(news, f, indent=2)
+    # The chart is drawn right away; headlines fill in as the news job delivers them
+    profile_mode = run.get("profile_mode")
+    news = runner.submit(news_job, ticker, all_dates, run["api_key"], profile_mode, name=f"{ticker} news",
+                         key=("news", ticker, all_dates, run["api_key"], profile_mode)).snapshot()
+    news_by_date = news["results"].get("news", {})
+    if news["status"] == "error":
+        st.warning(f"News lookup failed: {news['error']}")
+    elif news["status"] != "done":
+        st.progress(news["progress"], text=f"📰 Headlines for {len(news_by_date)}/{len(all_dates)} anomaly dates...")
 
-    # Visualize
-    st.info("📊 Generating interactive chart...")
-    generate_visualization(
-        price_csv=f"data/{ticker}_history.csv",
-        news_json=news_path,
+    # Visualize in-process: no HTML file round trip
+    fig = build_figure(
+        price_df=df,
+        news_by_date=news_by_date,
         ticker=ticker,
         z_anomalies=anomaly_dates,
         trend_anomalies=trend_dates,
         extreme_anomalies=extreme_dates,
-        run_anomalies=persistent_dates
+        run_anomalies=persistent_dates,
+        interval=interval
     )
+    st.plotly_chart(fig, width="stretch")
+    show_profile("Analysis", analysis["results"].get("profile"))
+    show_profile("News", news["results"].get("profile"))
+    return news["status"] not in ("done", "error")
+
+
+run = st.session_state.get("run")
+if run:
+    mark = time.time()
+    pending = st.session_state.get("pending", True)
 
-    chart_path = f"plots/{ticker.lower()}_anomaly_chart.html"
-    st.markdown(f"✅ [Open Interactive Chart]({chart_path})", unsafe_allow_html=True)
+    # While a job runs, only this fragment re-renders every POLL_SECONDS; once
+    # the jobs settle, a full rerun switches the polling off again.
+    @st.fragment(run_every=POLL_SECONDS if pending else None)
+    def live_results():
+        still_pending = show_results(run)
+        st.session_state["pending"] = still_pending
+        if still_pending != pending:
+            st.rerun()
 
-    # Optional: embed inside the app
-    with open(chart_path, "r", encoding="utf-8") as f:
-        html = f.read()
-    st.components.v1.html(html, height=600, scrolling=True)
+    live_results()
 
+    if show_timings:
+        spans = get_recorder().since(mark)
+        st.markdown("#### ⏱️ Stage timings")
+        if spans:
+            st.dataframe(pd.DataFrame(summarize(spans)), width="stretch")
+        else:
+            st.caption("Every stage was served from cache on this rerun.")
@@ -1,6 +1,44 @@
 import pandas as pd
 import numpy as np
+
+from scripts.metrics import span
+from scripts.rolling_stats import rolling_median_mad
+
 DEFAULT_MIN_GAP_DAYS = 3
+ROLLING_LOOKBACK = 60
+# Unit of the gap between pruned anomalies: 'days', 'bars' or a wall-clock
+# duration such as '1h' (set "gap_unit" in the config to override)
+DEFAULT_GAP_UNIT = "days"
+DEFAULT_CONFIG = {
+    "mad_threshold": 3.5,
+    "rolling_window": 5,
+    "rolling_threshold": 3.5,
+    "extreme_window": 3,
+    "extreme_threshold": 3.5,
+    "persistent_min_days": 7,
+    "persistent_threshold": 3.5,
+}
+# Looser thresholds every entry point offers by default: the CLI prompts, the
+# app's sliders and the batch, panel, streaming and benchmark commands.
+# DEFAULT_CONFIG stays the library default for calls without a config.
+PROMPT_DEFAULTS = {
+    "mad_threshold":        2.5,
+    "rolling_window":       5,
+    "rolling_threshold":    2.0,
+    "extreme_window":       3,
+    "extreme_threshold":    2.5,
+    "persistent_min_days":  7,
+    "persistent_threshold": 0.5,
+}
+# Config keys that change the scores themselves; the rest are thresholds
+WINDOW_KEYS = ("rolling_window", "extreme_window", "persistent_min_days")
+# Config keys of each detector's window (None: it has none) and threshold
+DETECTORS = {
+    "mad": (None, "mad_threshold"),
+    "rolling": ("rolling_window", "rolling_threshold"),
+    "extreme": ("extreme_window", "extreme_threshold"),
+    "persistent": ("persistent_min_days", "persistent_threshold"),
+}
 
 
 def modified_z_score(x: np.ndarray) -> np.ndarray:
@@ -19,7 +57,181 @@ def modified_z_score(x: np.ndarray) -> np.ndarray:
     return 0.6745 * (x - median) / mad
 
 
-def detect_all_anomalies(df: pd.DataFrame, config: dict = None) -> dict:
+def compute_features(df: pd.DataFrame, windows=()) -> dict:
+    """
+    Precompute the return features shared by every detector.
+
+    Arrays are NumPy views over `df` wherever possible, so building the
+    feature dict once and passing it to each detector avoids per-detector
+    copies and repeated pct_change() calls.
+
+    Args:
+        df: DataFrame with a DateTime index and 'Close' column.
+        windows: k values for which to precompute k-day compounded returns.
+    Returns:
+        Dict with:
+            - index: df.index
+            - close: closing prices
+            - returns: daily returns, aligned with index[1:]
+            - compound: {k: k-day compounded returns aligned with index[k:]}
+    """
+    close = df["Close"].to_numpy(dtype=float, copy=False)
+
+    # Compounded k-day return: exp(sum of k log returns) - 1, where the log-sum
+    # difference collapses to log(close[i]) - log(close[i - k]). close[i] / close[i - k]
+    # is the same quantity without the round trip through log/exp.
+    compound = {k: close[k:] / close[:-k] - 1 for k in set(windows) if k > 0}
+
+    return {
+        "index": df.index,
+        "close": close,
+        "returns": close[1:] / close[:-1] - 1,
+        "compound": compound,
+    }
+
+
+def _features_for(df: pd.DataFrame, features: dict, window: int = None) -> dict:
+    # Reuse the shared feature dict, filling in a compounded window if missing
+    if features is None:
+        return compute_features(df, windows=(window,) if window else ())
+    if window and window not in features["compound"]:
+        close = features["close"]
+        features["compound"][window] = close[window:] / close[:-window] - 1
+    return features
+
+
+def select_min_gap(times: np.ndarray, min_gap: int) -> np.ndarray:
+    """
+    Greedy minimum-gap event selection.
+
+    Keeps the first event, then every next event at least `min_gap` after the
+    last kept one. Each event's successor is found with a single vectorized
+    searchsorted, so the remaining walk only touches the kept events.
+
+    Args:
+        times: Sorted 1D int64 array, e.g. nanosecond timestamps.
+        min_gap: Minimum distance between kept events, in the same unit.
+    Returns:
+        Positional indices into `times` of the kept events.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    n = len(times)
+    if n == 0 or min_gap <= 0:
+        return np.arange(n)
+    successor = np.searchsorted(times, times + min_gap, side="left")
+    kept = []
+    i = 0
+    while i < n:
+        kept.append(i)
+        i = successor[i]
+    return np.asarray(kept, dtype=np.intp)
+
+
+def _gap_times(index, pos: np.ndarray, gap: int, unit: str = DEFAULT_GAP_UNIT):
+    # (times, min_gap) for select_min_gap(): bar positions when counting bars,
+    # otherwise UTC nanoseconds and `gap` multiples of the unit's duration
+    if unit == "bars":
+        return pos, int(gap)
+    step = pd.Timedelta(days=1) if unit == "days" else pd.Timedelta(unit)
+    return _as_ns(index[pos]), int(gap) * step.value
+
+
+def _as_ns(index) -> np.ndarray:
+    # int64 nanoseconds since the epoch; naive timestamps are read as UTC
+    return pd.to_datetime(index, utc=True).values.astype("datetime64[ns]").view(np.int64)
+
+
+def compute_scores(df: pd.DataFrame, config: dict = None, features: dict = None) -> dict:
+    """
+    Compute every detector's modified Z-scores without applying any threshold.
+
+    The scores depend only on the prices and the window settings in
+    WINDOW_KEYS, so they can be cached and re-thresholded cheaply with
+    apply_thresholds().
+
+    Args:
+        df: DataFrame with a DateTime index and 'Close' column.
+        config: Detection config; only the WINDOW_KEYS are used.
+        features: Optional output of compute_features(df) to reuse.
+    Returns:
+        Dict with the window settings under 'windows', the shared 'features',
+        and one score dict per detector under 'mad', 'rolling', 'extreme', 'persistent'.
+    """
+    config = config or DEFAULT_CONFIG
+    if features is None:
+        features = compute_features(df, windows=(config["rolling_window"], config["extreme_window"]))
+
+    scores = {"windows": {k: config[k] for k in WINDOW_KEYS}, "features": features}
+    for detector, (window_key, _) in DETECTORS.items():
+        with span("detect", detector=detector, phase="score"):
+            scores[detector] = score_detector(features, detector, config[window_key] if window_key else None)
+    return scores
+
+
+def apply_thresholds(scores: dict, config: dict = None) -> dict:
+    """
+    Turn precomputed scores into anomaly tables for the thresholds in `config`.
+
+    Only comparisons and gap-pruning run here, so this is cheap enough to
+    call on every slider change or threshold sweep step.
+
+    Returns:
+        Same dict as detect_all_anomalies().
+    """
+    config = config or DEFAULT_CONFIG
+    gap_unit = config.get("gap_unit", DEFAULT_GAP_UNIT)
+    results = {}
+    for detector, (_, threshold_key) in DETECTORS.items():
+        with span("detect", detector=detector, phase="threshold"):
+            results[detector] = threshold_detector(
+                scores["features"], scores[detector], detector, config[threshold_key], gap_unit
+            )
+    return results
+
+
+def score_detector(features: dict, detector: str, window: int = None) -> dict:
+    """
+    Compute one detector's scores for one window setting.
+
+    Lets a caller that varies a single detector's settings (e.g. a
+    threshold sweep) score each window once and re-threshold it with
+    threshold_detector().
+
+    Args:
+        features: Output of compute_features(); missing compounded windows are added.
+        detector: A key of DETECTORS.
+        window: The detector's window setting (ignored for 'mad').
+    """
+    if detector not in DETECTORS:
+        raise ValueError(f"detector must be one of {list(DETECTORS)}, got {detector!r}")
+    if detector == "mad":
+        return _mad_scores(features)
+    if detector == "persistent":
+        return _persistent_scores(features, window)
+    features = _features_for(None, features, window)
+    if detector == "rolling":
+        return _rolling_scores(features, window)
+    return _extreme_scores(features, window)
+
+
+def threshold_detector(
+    features: dict,
+    scores: dict,
+    detector: str,
+    threshold: float,
+    gap_unit: str = DEFAULT_GAP_UNIT
+) -> pd.DataFrame:
+    """Anomaly table of one detector from score_detector() output (see detect_all_anomalies)."""
+    if detector == "mad":
+        return _select_mad(features, scores, threshold)
+    if detector == "rolling":
+        return _select_rolling(features, scores, scores["offset"], threshold, gap_unit)
+    if detector == "extreme":
+        return _select_extreme(features, scores, threshold, gap_unit=gap_unit)
+    return _select_persistent(features, scores, threshold)
+
+
+def detect_all_anomalies(df: pd.DataFrame, config: dict = None, features: dict = None) -> dict:
     """
     Run all anomaly detectors with configurable thresholds.
 
@@ -30,232 +242,225 @@ def detect_all_anomalies(df: pd.DataFrame, config: dict = None) -> dict:
             - rolling_window, rolling_threshold
             - extreme_window, extreme_threshold
             - persistent_min_days, persistent_threshold
+            - gap_unit (optional): 'days' (default), 'bars' or a duration
+              like '1h'; rolling and extreme anomalies closer than their
+              window / min gap in this unit are pruned. Windows always
+              count bars.
+        features: Optional output of compute_features(df) to reuse, e.g. from a cache.
     Returns:
         Dict with keys 'mad', 'rolling', 'extreme', 'persistent', each a DataFrame of anomalies.
     """
-    if config is None:
-        config = {
-            "mad_threshold": 3.5,
-            "rolling_window": 5,
-            "rolling_threshold": 3.5,
-            "extreme_window": 3,
-            "extreme_threshold": 3.5,
-            "persistent_min_days": 7,
-            "persistent_threshold": 3.5,
-        }
-    results = {}
+    return apply_thresholds(compute_scores(df, config, features), config)
+
+
+def _mad_scores(features: dict) -> dict:
+    returns = features["returns"]
+    return {"values": returns, "z": modified_z_score(returns)}
 
-    results["mad"] = detect_anomalies_mad(df, threshold=config["mad_threshold"])
-    results["rolling"] = detect_rolling_trend_anomalies(
-        df,
-        window=config["rolling_window"],
-        threshold=config["rolling_threshold"]
-    )
-    results["extreme"] = detect_extreme_multi_day_anomalies(
-        df,
-        window=config["extreme_window"],
-        threshold=config["extreme_threshold"]
-    )
-    results["persistent"] = detect_persistent_run_anomalies(
-        df,
-        min_days=config["persistent_min_days"],
-        threshold=config["persistent_threshold"]
-    )
-    return results
 
+def _select_mad(features: dict, scores: dict, threshold: float) -> pd.DataFrame:
+    z_scores = scores["z"]
+    anomaly = np.abs(z_scores) > threshold
+    pos = np.flatnonzero(anomaly) + 1   # returns start at the second bar
 
-def detect_anomalies_mad(df: pd.DataFrame, threshold: float) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Close": features["close"][pos],
+        "Return": scores["values"][anomaly],
+        "ModifiedZ": z_scores[anomaly],
+    }, index=features["index"][pos])
+
+
+def detect_anomalies_mad(df: pd.DataFrame, threshold: float, features: dict = None) -> pd.DataFrame:
     """
     Detect single-day anomalies using Modified Z-Score on daily returns.
 
     Returns:
         DataFrame of anomalies with ['Close', 'Return', 'ModifiedZ'].
     """
-    df = df.copy()
-    df["Return"] = df["Close"].pct_change()
+    features = _features_for(df, features)
+    return _select_mad(features, _mad_scores(features), threshold)
+
+
+def _rolling_scores(features: dict, window: int) -> dict:
+    rolling = features["compound"][window]
+    median, mad = rolling_median_mad(rolling, ROLLING_LOOKBACK)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = 0.6745 * (rolling - median) / np.where(mad == 0, np.nan, mad)
+    return {"values": rolling, "z": z, "offset": window}
 
-    returns = df["Return"].dropna().values
-    z_scores = modified_z_score(returns)
 
-    df = df.iloc[1:].copy()
-    df["ModifiedZ"] = z_scores
-    df["Anomaly"] = df["ModifiedZ"].abs() > threshold
+def _select_rolling(
+    features: dict,
+    scores: dict,
+    window: int,
+    threshold: float,
+    gap_unit: str = DEFAULT_GAP_UNIT
+) -> pd.DataFrame:
+    z = scores["z"]
+    anomaly = np.abs(z) > threshold
 
-    return df[df["Anomaly"]][["Close", "Return", "ModifiedZ"]]
+    pos = np.flatnonzero(anomaly)
+    index = features["index"][scores["offset"]:]
+    dates = pd.to_datetime(index[pos], utc=True)
 
+    # Collapse anomalies within 'window' days (or bars / gap units)
+    kept = select_min_gap(*_gap_times(index, pos, window, gap_unit))
+    pos = pos[kept]
 
-def detect_rolling_trend_anomalies(df: pd.DataFrame, window: int, threshold: float) -> pd.DataFrame:
+    return pd.DataFrame({
+        "AnomalyDate": dates[kept],
+        "RollingReturn": scores["values"][pos],
+        "ModifiedZ": z[pos],
+    }, index=features["index"][scores["offset"]:][pos])
+
+
+def detect_rolling_trend_anomalies(
+    df: pd.DataFrame,
+    window: int,
+    threshold: float,
+    features: dict = None,
+    gap_unit: str = DEFAULT_GAP_UNIT
+) -> pd.DataFrame:
     """
     Detect multi-day rolling-window anomalies using localized Modified Z-Score.
 
-    Uses a 60-period lookback for median and MAD to adapt to recent volatility.
+    Uses a ROLLING_LOOKBACK (60-period) lookback for median and MAD to adapt to recent volatility.
 
     Returns:
         DataFrame with ['AnomalyDate', 'RollingReturn', 'ModifiedZ'].
     """
-    df = df.copy()
-    df["RollingReturn"] = df["Close"].pct_change(periods=window)
-    df = df.dropna(subset=["RollingReturn"]).copy()
+    features = _features_for(df, features, window)
+    return _select_rolling(features, _rolling_scores(features, window), window, threshold, gap_unit)
 
-    df["Median"] = df["RollingReturn"].rolling(60, min_periods=1).median()
-    df["MAD"] = df["RollingReturn"].rolling(60, min_periods=1) \
-        .apply(lambda x: np.median(np.abs(x - np.median(x))), raw=True)
 
-    df["ModifiedZ"] = 0.6745 * (df["RollingReturn"] - df["Median"]) / df["MAD"].replace(0, np.nan)
-    df["RollingAnomaly"] = df["ModifiedZ"].abs() > threshold
+def _extreme_scores(features: dict, window: int) -> dict:
+    rolling = features["compound"][window]
+    return {"values": rolling, "z": modified_z_score(rolling), "offset": window}
 
-    anomalies = df[df["RollingAnomaly"]].copy()
-    anomalies["AnomalyDate"] = pd.to_datetime(anomalies.index, utc=True)
 
-    # Collapse anomalies within 'window' days
-    grouped = []
-    last_date = None
-    for date in anomalies["AnomalyDate"]:
-        if last_date is None or (date - last_date).days >= window:
-            grouped.append(date)
-            last_date = date
-    collapsed = anomalies[anomalies["AnomalyDate"].isin(grouped)].copy()
+def _select_extreme(
+    features: dict,
+    scores: dict,
+    threshold: float,
+    min_gap_days: int = DEFAULT_MIN_GAP_DAYS,
+    gap_unit: str = DEFAULT_GAP_UNIT
+) -> pd.DataFrame:
+    # 1) find all anomaly positions in the rolling compounded returns
+    z = scores["z"]
+    pos = np.flatnonzero(np.abs(z) > threshold)
+
+    # 2) prune dates so at least min_gap_days (or bars / gap units) apart
+    pos = pos[select_min_gap(*_gap_times(features["index"][scores["offset"]:], pos, min_gap_days, gap_unit))]
+    if not len(pos):
+        return pd.DataFrame({"AnomalyDate": [], "RollingReturn": [], "ModifiedZ": []})
+
+    # 3) build the output DataFrame
+    anomalies = pd.DataFrame({
+        "AnomalyDate": features["index"][scores["offset"]:][pos].tolist(),
+        "RollingReturn": scores["values"][pos],
+        "ModifiedZ": z[pos],
+    })
+
+    # 4) drop timezone info
+    try:
+        anomalies["AnomalyDate"] = anomalies["AnomalyDate"].dt.tz_localize(None)
+    except (AttributeError, ValueError):
+        pass
+
+    return anomalies
 
-    return collapsed[["AnomalyDate", "RollingReturn", "ModifiedZ"]]
 
 def detect_extreme_multi_day_anomalies(
     df: pd.DataFrame,
     window: int,
     threshold: float,
-    min_gap_days: int = DEFAULT_MIN_GAP_DAYS
+    min_gap_days: int = DEFAULT_MIN_GAP_DAYS,
+    features: dict = None,
+    gap_unit: str = DEFAULT_GAP_UNIT
 ) -> pd.DataFrame:
     """
     Detect extreme anomalies over a multi-day window using Modified Z-Score.
     Returns a DataFrame with ['AnomalyDate','RollingReturn','ModifiedZ'].
-    Ensures anomalies are at least `min_gap_days` apart, and returns naive datetimes.
+    Ensures anomalies are at least `min_gap_days` apart (counted in `gap_unit`),
+    and returns naive datetimes.
     """
-    df = df.copy()
-    df["Return"] = df["Close"].pct_change()
-
-    # 1) rolling compounded returns
-    rolling = (
-        (1 + df["Return"])
-        .rolling(window=window)
-        .apply(lambda x: x.prod() - 1, raw=True)
-        .dropna()
-    )
-
-    # 2) modified Z-scores
-    z = modified_z_score(rolling.values)
-
-    # 3) find all anomaly dates
-    all_dates = rolling.index[np.abs(z) > threshold]
-
-    # 4) prune dates so at least min_gap_days apart
-    pruned = []
-    last = None
-    for d in sorted(all_dates):
-        if last is None or (d - last).days >= min_gap_days:
-            pruned.append(d)
-            last = d
-
-    # 5) build the output DataFrame
-    anomalies = pd.DataFrame({
-        "AnomalyDate": pruned,
-        "RollingReturn": [rolling.loc[d] for d in pruned],
-        "ModifiedZ":       [z[list(all_dates).index(d)] for d in pruned]
-    })
+    features = _features_for(df, features, window)
+    return _select_extreme(features, _extreme_scores(features, window), threshold, min_gap_days, gap_unit)
 
-    # 6) drop timezone info
-    try:
-        anomalies["AnomalyDate"] = anomalies["AnomalyDate"].dt.tz_localize(None)
-    except (AttributeError, ValueError):
-        pass
 
-    return anomalies
+def directional_runs(close: np.ndarray):
+    """
+    Segment a price series into directional runs in a single vectorized pass.
+
+    A run starts on the bar before its first non-zero return and ends on the
+    bar before the return that flips direction, so consecutive runs share a
+    boundary bar. Zero returns extend the current run; leading zero returns
+    are skipped.
+
+    Args:
+        close: 1D array of closing prices.
+    Returns:
+        Tuple of (start_idx, end_idx, cumulative_return) arrays, one entry per run.
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    if n < 2:
+        return np.array([0]), np.array([n - 1]), np.zeros(1)
 
+    growth = close[1:] / close[:-1]          # 1 + return for bars 1..n-1
+    sign = np.sign(growth - 1)
+    sign[np.isnan(sign)] = 0
+    nonzero = np.flatnonzero(sign)
+    if len(nonzero) == 0:
+        return np.array([n - 2]), np.array([n - 1]), np.zeros(1)
 
-def detect_persistent_run_anomalies(df: pd.DataFrame, min_days: int, threshold: float) -> pd.DataFrame:
+    # A run begins at the first non-zero return and at every direction flip
+    flips = nonzero[1:][np.diff(sign[nonzero]) != 0]
+    first = np.concatenate(([nonzero[0]], flips))  # positions in `growth`
+
+    start_idx = first                               # bar before first return
+    end_idx = np.append(first[1:], n - 1)           # bar before the flip
+    cumulative = np.multiply.reduceat(growth, first) - 1
+    return start_idx, end_idx, cumulative
+
+
+def _persistent_scores(features: dict, min_days: int) -> dict:
+    start_idx, end_idx, cum_returns = directional_runs(features["close"])
+
+    keep = end_idx - start_idx + 1 >= min_days
+    start_idx, end_idx, cum_returns = start_idx[keep], end_idx[keep], cum_returns[keep]
+    z = modified_z_score(cum_returns) if len(cum_returns) else cum_returns
+    return {"start": start_idx, "end": end_idx, "values": cum_returns, "z": z}
+
+
+def _select_persistent(features: dict, scores: dict, threshold: float) -> pd.DataFrame:
+    columns = ["start_date", "end_date", "cumulative_return", "direction"]
+    if not len(scores["values"]):
+        return pd.DataFrame(columns=columns)
+
+    # Keep the runs whose z-score is flagged
+    flagged = np.abs(scores["z"]) > threshold
+    cum_returns = scores["values"][flagged]
+
+    return pd.DataFrame({
+        "start_date": features["index"][scores["start"][flagged]],
+        "end_date": features["index"][scores["end"][flagged]],
+        "cumulative_return": cum_returns,
+        "direction": np.where(cum_returns > 0, "up", "down"),
+    }, columns=columns)
+
+
+def detect_persistent_run_anomalies(
+    df: pd.DataFrame,
+    min_days: int,
+    threshold: float,
+    features: dict = None
+) -> pd.DataFrame:
     """
     Detect persistent directional runs of at least min_days, flag runs whose
     cumulative return's Modified Z-Score exceeds threshold.
 
     Returns DataFrame with ['start_date', 'end_date', 'cumulative_return', 'direction'].
     """
-    df = df.copy()
-    df["Return"] = df["Close"].pct_change()
-
-    # First pass: collect all run cumulative returns
-    cum_returns = []
-    direction = 0
-    start_idx = 0
-    run_returns = []
-    for i in range(1, len(df)):
-        ret = df["Return"].iat[i]
-        curr_dir = 1 if ret > 0 else (-1 if ret < 0 else 0)
-        if direction == 0:
-            direction = curr_dir
-            start_idx = i - 1
-            run_returns = [ret] if ret != 0 else []
-        elif curr_dir == direction or curr_dir == 0:
-            if ret != 0:
-                run_returns.append(ret)
-        else:
-            end_idx = i - 1
-            length = end_idx - start_idx + 1
-            if length >= min_days:
-                cum_returns.append(np.prod([1 + r for r in run_returns]) - 1)
-            direction = curr_dir
-            start_idx = i - 1
-            run_returns = [ret] if ret != 0 else []
-    # final run
-    end_idx = len(df) - 1
-    length = end_idx - start_idx + 1
-    if length >= min_days:
-        cum_returns.append(np.prod([1 + r for r in run_returns]) - 1)
-
-    if not cum_returns:
-        return pd.DataFrame(columns=["start_date","end_date","cumulative_return","direction"])
-
-    # Compute z-scores on run returns
-    run_z = modified_z_score(np.array(cum_returns))
-
-    # Second pass: collect flagged runs
-    results = []
-    run_idx = 0
-    direction = 0
-    start_idx = 0
-    run_returns = []
-    for i in range(1, len(df)):
-        ret = df["Return"].iat[i]
-        curr_dir = 1 if ret > 0 else (-1 if ret < 0 else 0)
-        if direction == 0:
-            direction = curr_dir
-            start_idx = i - 1
-            run_returns = [ret] if ret != 0 else []
-        elif curr_dir == direction or curr_dir == 0:
-            if ret != 0:
-                run_returns.append(ret)
-        else:
-            end_idx = i - 1
-            length = end_idx - start_idx + 1
-            if length >= min_days:
-                cum_ret = np.prod([1 + r for r in run_returns]) - 1
-                if abs(run_z[run_idx]) > threshold:
-                    results.append({
-                        "start_date": df.index[start_idx],
-                        "end_date": df.index[end_idx],
-                        "cumulative_return": cum_ret,
-                        "direction": "up" if cum_ret > 0 else "down"
-                    })
-                run_idx += 1
-            direction = curr_dir
-            start_idx = i - 1
-            run_returns = [ret] if ret != 0 else []
-    # final check
-    if length >= min_days:
-        cum_ret = np.prod([1 + r for r in run_returns]) - 1
-        if abs(run_z[run_idx]) > threshold:
-            results.append({
-                "start_date": df.index[start_idx],
-                "end_date": df.index[end_idx],
-                "cumulative_return": cum_ret,
-                        "direction": "up" if cum_ret > 0 else "down"
-            })
-
-    return pd.DataFrame(results)
+    features = _features_for(df, features)
+    return _select_persistent(features, _persistent_scores(features, min_days), threshold)
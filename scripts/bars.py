@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+# Bar sizes the pipeline understands, finest first
+INTERVALS = ("1m", "5m", "1h", "1d")
+# Pre-aggregated levels kept next to an intraday base series
+PYRAMID_LEVELS = ("5m", "1h", "1d")
+# US equities open at 9:30, so hourly bins are anchored at :30 like yfinance's own 1h bars
+LEVEL_OFFSETS = {"1h": "30min"}
+# How far back yfinance serves each intraday interval
+MAX_LOOKBACK = {"1m": "7d", "5m": "60d", "1h": "730d"}
+# How each OHLCV column is aggregated into a coarser bar; other columns keep the last value
+AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+    "Dividends": "sum",
+    "Stock Splits": "max",
+}
+
+
+def interval_ns(interval):
+    """Width of one `interval` bar ('1m', '5m', '1h', '1d') in nanoseconds."""
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {INTERVALS}, got {interval!r}")
+    return pd.Timedelta(interval).value
+
+
+def is_intraday(interval):
+    return interval_ns(interval) < pd.Timedelta("1d").value
+
+
+def _offset_ns(interval):
+    return pd.Timedelta(LEVEL_OFFSETS.get(interval, 0)).value
+
+
+def _nests(fine, coarse):
+    # Every `fine` bin lies inside exactly one `coarse` bin
+    width = interval_ns(fine)
+    return interval_ns(coarse) % width == 0 and (_offset_ns(coarse) - _offset_ns(fine)) % width == 0
+
+
+def _wall_ns(index):
+    # Local wall-clock nanoseconds, so daily bins follow the exchange's calendar day
+    index = pd.DatetimeIndex(index)
+    wall = index.tz_localize(None) if index.tz is not None else index
+    return wall.values.astype("datetime64[ns]").view(np.int64)
+
+
+def _reduce(values, starts, how):
+    ends = np.append(starts[1:], len(values)) - 1
+    if how == "first":
+        return values[starts]
+    if how == "last":
+        return values[ends]
+    if how == "max":
+        return np.fmax.reduceat(values, starts)
+    if how == "min":
+        return np.fmin.reduceat(values, starts)
+    return np.add.reduceat(np.nan_to_num(values), starts)
+
+
+def resample_ohlc(df, interval):
+    """
+    Aggregate bars into coarser `interval` bars in one vectorized pass.
+
+    Bins are laid out on the index's local wall clock (plus LEVEL_OFFSETS)
+    and labelled by their start, like yfinance bars. Open/High/Low/Close/Volume
+    use first/max/min/last/sum (see AGGREGATIONS); bins without bars are
+    skipped rather than filled.
+
+    Args:
+        df: OHLCV DataFrame with a sorted DatetimeIndex finer than `interval`.
+        interval: Target bar size, one of INTERVALS.
+    Returns:
+        DataFrame with the same columns and timezone, one row per non-empty bin.
+    """
+    width, offset = interval_ns(interval), _offset_ns(interval)
+    index = pd.DatetimeIndex(df.index)
+    if len(index) == 0:
+        return df.iloc[:0]
+
+    wall = _wall_ns(index)
+    bins = (wall - offset) // width
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+
+    numeric = df.select_dtypes(include="number")
+    columns = {
+        col: _reduce(numeric[col].to_numpy(dtype=float), starts, AGGREGATIONS.get(col, "last"))
+        for col in numeric.columns
+    }
+
+    label_wall = bins[starts] * width + offset
+    labels = pd.DatetimeIndex(label_wall.view("datetime64[ns]"), name=index.name)
+    if index.tz is not None:
+        # A label can fall in a DST gap or overlap; those take the offset of the bin's first bar
+        localized = labels.tz_localize(index.tz, ambiguous="NaT", nonexistent="NaT")
+        if localized.hasnans:
+            fallback = index[starts].asi8 - (wall[starts] - label_wall)
+            utc = np.where(localized.isna(), fallback, localized.asi8)
+            localized = pd.DatetimeIndex(utc.view("datetime64[ns]"), name=index.name) \
+                .tz_localize("UTC").tz_convert(index.tz)
+        labels = localized
+    return pd.DataFrame(columns, index=labels)
+
+
+def _source_level(levels, interval):
+    # Coarsest already-built level whose bins nest inside `interval` bins
+    candidates = [name for name in levels if interval_ns(name) < interval_ns(interval) and _nests(name, interval)]
+    return max(candidates, key=interval_ns)
+
+
+def build_pyramid(df, base_interval, levels=PYRAMID_LEVELS):
+    """
+    Pre-aggregate a base series into every coarser pyramid level.
+
+    Each level is resampled from the coarsest level already built whose
+    bins nest inside it (1m -> 5m -> 1h, and 1d from 5m because hourly
+    bins straddle midnight), so the base is scanned once.
+
+    Returns:
+        {interval: DataFrame}, including the base itself.
+    """
+    pyramid = {base_interval: df}
+    for level in sorted(levels, key=interval_ns):
+        if interval_ns(level) > interval_ns(base_interval):
+            pyramid[level] = resample_ohlc(pyramid[_source_level(pyramid, level)], level)
+    return pyramid
+
+
+def update_pyramid(pyramid, df, base_interval, since):
+    """
+    Refresh a pyramid after bars from `since` on were appended or replaced.
+
+    Only bins that contain `since` or later are re-aggregated; older rows of
+    every level are kept as they are.
+
+    Args:
+        pyramid: Existing {interval: DataFrame} from build_pyramid().
+        df: The full, updated base series.
+        since: Timestamp of the first new or changed base bar.
+    Returns:
+        The updated pyramid.
+    """
+    updated = {base_interval: df}
+    since = pd.Timestamp(since)
+    if df.index.tz is not None:
+        since = since.tz_convert(df.index.tz) if since.tzinfo else since.tz_localize(df.index.tz)
+    since_wall = _wall_ns([since])[0]
+    for level in sorted(pyramid, key=interval_ns):
+        if interval_ns(level) <= interval_ns(base_interval):
+            continue
+        width, offset = interval_ns(level), _offset_ns(level)
+        cut = (since_wall - offset) // width * width + offset
+        source = updated[_source_level(updated, level)]
+        old = pyramid[level]
+        updated[level] = pd.concat([
+            old[_wall_ns(old.index) < cut],
+            resample_ohlc(source[_wall_ns(source.index) >= cut], level),
+        ])
+    return updated
@@ -0,0 +1,152 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from scripts.data_fetcher import fetch_and_save_stock_data
+from scripts.analyzer import PROMPT_DEFAULTS, detect_all_anomalies
+from scripts.history_store import BATCH_SIZE, HistoryStore
+
+
+def read_universe(path):
+    """
+    Read tickers from a universe file.
+
+    One or more tickers per line, separated by commas or whitespace. Blank
+    lines and lines starting with '#' are ignored; duplicates are dropped.
+    """
+    tickers = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            tickers += [t.strip().upper() for t in line.replace(",", " ").split()]
+    return list(dict.fromkeys(tickers))
+
+
+def save_anomalies(ticker, anomalies, out_dir="data"):
+    """
+    Persist detector output next to the price history.
+
+    The 1-day MAD table keeps the existing `{ticker}_anomalies.csv` name;
+    the other detectors get `{ticker}_{kind}_anomalies.csv`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for kind, frame in anomalies.items():
+        suffix = "anomalies" if kind == "mad" else f"{kind}_anomalies"
+        frame.to_csv(os.path.join(out_dir, f"{ticker}_{suffix}.csv"))
+
+
+def scan_ticker(ticker, period="1y", config=None, out_dir="data"):
+    """
+    Run fetch -> detect -> persist for one ticker.
+
+    Never raises: failures are reported in the returned dict so one bad
+    ticker cannot take down the batch.
+    """
+    started = time.perf_counter()
+    result = {"ticker": ticker, "status": "ok", "error": ""}
+    try:
+        df = fetch_and_save_stock_data(ticker, period=period)
+        if df is None:
+            raise ValueError("no price data returned")
+        anomalies = detect_all_anomalies(df, config=config or PROMPT_DEFAULTS)
+        save_anomalies(ticker, anomalies, out_dir=out_dir)
+        result.update({kind: len(frame) for kind, frame in anomalies.items()})
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def prefetch(tickers, period="1y", batch_size=BATCH_SIZE, store=None):
+    """
+    Bring every ticker's stored history up to date with batched downloads.
+
+    The per-ticker scans then read from the store instead of making one
+    request each. Tickers the bulk download misses are fetched again on
+    their own when their scan runs.
+
+    Returns:
+        {ticker: error} for tickers the bulk download could not fetch.
+    """
+    store = store or HistoryStore()
+    _, failed = store.get_many(tickers, period=period, batch_size=batch_size)
+    return failed
+
+
+def run_batch(tickers, period="1y", config=None, out_dir="data", workers=None):
+    """
+    Scan many tickers on a process pool, yielding results as they finish.
+
+    Args:
+        tickers: Iterable of ticker symbols.
+        period: yfinance history period for every ticker.
+        config: Detector thresholds (defaults to analyzer.PROMPT_DEFAULTS).
+        out_dir: Directory for the per-ticker anomaly CSVs.
+        workers: Pool size, defaults to the number of CPU cores.
+    Yields:
+        One result dict per ticker, in completion order.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(scan_ticker, t, period, config, out_dir): t
+            for t in tickers
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:  # worker crashed before it could report
+                yield {"ticker": futures[future], "status": "error",
+                       "error": f"{type(e).__name__}: {e}", "seconds": None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a universe of tickers for anomalies.")
+    parser.add_argument("universe", help="File with tickers, one or more per line")
+    parser.add_argument("--period", default="1y", help="yfinance history period (default 1y)")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU cores)")
+    parser.add_argument("--bulk-size", type=int, default=BATCH_SIZE,
+                        help="Tickers per bulk download before the scan (0 to fetch each ticker on its own)")
+    parser.add_argument("--out-dir", default="data", help="Where to write anomaly CSVs")
+    parser.add_argument("--summary", default="data/batch_summary.csv", help="Per-ticker summary CSV")
+    for key in ("mad_threshold", "rolling_threshold", "extreme_threshold", "persistent_threshold"):
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=PROMPT_DEFAULTS[key])
+    args = parser.parse_args(argv)
+
+    config = dict(PROMPT_DEFAULTS)
+    config.update({k: getattr(args, k) for k in config if hasattr(args, k)})
+
+    tickers = read_universe(args.universe)
+    started = time.perf_counter()
+    if args.bulk_size > 0:
+        print(f"📦 Prefetching {len(tickers)} tickers in batches of {args.bulk_size}")
+        failed = prefetch(tickers, args.period, args.bulk_size)
+        print(f"✅ Prefetched {len(tickers) - len(failed)} tickers in {time.perf_counter() - started:.1f}s"
+              + (f"; {len(failed)} will be fetched one by one" if failed else ""))
+
+    print(f"🚀 Scanning {len(tickers)} tickers with {args.workers or os.cpu_count()} workers")
+    rows = []
+    started = time.perf_counter()
+    for i, result in enumerate(run_batch(tickers, args.period, config, args.out_dir, args.workers), 1):
+        rows.append(result)
+        elapsed = time.perf_counter() - started
+        if result["status"] == "ok":
+            counts = ", ".join(f"{k}={result[k]}" for k in ("mad", "rolling", "extreme", "persistent"))
+            print(f"✅ [{i}/{len(tickers)}] {result['ticker']}: {counts} ({i / elapsed:.2f} tickers/s)")
+        else:
+            print(f"❌ [{i}/{len(tickers)}] {result['ticker']}: {result['error']}")
+
+    elapsed = time.perf_counter() - started
+    failed = sum(r["status"] != "ok" for r in rows)
+    if args.summary:
+        os.makedirs(os.path.dirname(args.summary) or ".", exist_ok=True)
+        pd.DataFrame(rows).to_csv(args.summary, index=False)
+    print(f"✅ Done: {len(rows) - failed} ok, {failed} failed in {elapsed:.1f}s "
+          f"({len(rows) / elapsed if elapsed else 0:.2f} tickers/s)")
+
+
+if __name__ == "__main__":
+    main()
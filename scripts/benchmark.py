@@ -0,0 +1,307 @@
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import scripts.newsapi_fetcher as newsapi_fetcher
+import scripts.ticker_meta as ticker_meta
+from scripts.analyzer import (
+    PROMPT_DEFAULTS, detect_all_anomalies, detect_anomalies_mad, detect_extreme_multi_day_anomalies,
+    detect_persistent_run_anomalies, detect_rolling_trend_anomalies, modified_z_score
+)
+from scripts.bars import is_intraday
+from scripts.http_client import TokenBucket
+from scripts.main import fetch_news_for_anomalies
+from scripts.news_cache import NewsCache
+from scripts.price_io import read_price_csv
+from scripts.visualize import anomaly_keys, build_figure, generate_visualization
+
+# Synthetic series lengths, in 1-minute bars (5M bars is ~9.5 years of minutes)
+SIZES = (250, 25_000, 250_000, 1_000_000, 5_000_000)
+BASELINE_PATH = "data/benchmark_baseline.json"
+# A stage regresses if it is this much slower / uses this much more peak memory
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.25
+# Timing differences below this many seconds are treated as noise
+NOISE_FLOOR = 0.002
+# Chart stages are skipped above this many bars: the line is decimated, but
+# every bar is still keyed and flagged and the HTML embeds the zoom levels,
+# so chart time still grows with the series
+VIZ_MAX_BARS = 250_000
+# Simulated round-trip time of the mock news server, in seconds
+MOCK_LATENCY = 0.02
+
+
+def synthetic_prices(n, seed=0):
+    """Seeded fat-tailed random walk of `n` 1-minute bars with a UTC index."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.standard_t(3, n) * 0.002))
+    index = pd.date_range("2000-01-03", periods=n, freq="min", tz="UTC", name="Date")
+    return pd.DataFrame({"Close": close}, index=index)
+
+
+def datasets(sizes, data_dir="data"):
+    """Yield (name, DataFrame, interval) for each synthetic size and each bundled history CSV."""
+    for n in sizes:
+        yield f"synthetic-{n}", synthetic_prices(n), "1m"
+    for path in sorted(glob.glob(os.path.join(data_dir, "*_history.csv"))):
+        yield os.path.basename(path)[:-len("_history.csv")], read_price_csv(path), "1d"
+
+
+def measure(fn, repeat):
+    """
+    Time `fn` (best of `repeat` untraced runs), then run it once under tracemalloc.
+
+    Returns:
+        Dict with 'seconds', 'peak_bytes' (tracemalloc peak above the starting
+        point) and 'blocks' (net memory blocks still allocated afterwards).
+    """
+    best = float("inf")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - start_bytes
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {"seconds": best, "peak_bytes": peak, "blocks": blocks}
+
+
+def _anomaly_dates(anomalies, interval, tz=None):
+    # Same marker keys main.py passes to the chart step (bar times on intraday charts)
+    intraday = is_intraday(interval)
+    return {
+        "z_anomalies": anomaly_keys(anomalies["mad"].index, intraday),
+        "trend_anomalies": anomaly_keys(anomalies["rolling"]["AnomalyDate"], intraday),
+        "extreme_anomalies": anomaly_keys(anomalies["extreme"]["AnomalyDate"], intraday, tz=tz),
+        "run_anomalies": anomaly_keys(anomalies["persistent"]["start_date"], intraday),
+    }
+
+
+class MockNewsHandler(BaseHTTPRequestHandler):
+    """
+    TheNewsAPI-shaped responses: three articles per day, paged like the real API.
+
+    Set `page_cap` to lower the page size the way plan limits do (3 on the free plan).
+    """
+
+    latency = MOCK_LATENCY
+    page_cap = None
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        if "published_on" in params:
+            days = [params["published_on"]]
+        else:
+            start = datetime.date.fromisoformat(params["published_after"][:10])
+            end = datetime.date.fromisoformat(params["published_before"][:10])
+            days = [(start + datetime.timedelta(d)).isoformat() for d in range((end - start).days + 1)]
+        articles = [
+            {"title": f"{params.get('search')} headline {i}", "url": f"https://example.com/{day}/{i}",
+             "source": "example.com", "published_at": f"{day}T1{i}:00:00.000000Z"}
+            for day in days for i in range(3)
+        ]
+        limit = int(params.get("limit", 5))
+        if self.page_cap:
+            limit = min(limit, self.page_cap)
+        page = int(params.get("page", 1))
+        data = articles[(page - 1) * limit:page * limit]
+        body = json.dumps({
+            "meta": {"found": len(articles), "returned": len(data), "limit": limit, "page": page},
+            "data": data,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def mock_news_server(latency=MOCK_LATENCY, page_cap=None):
+    """Serve MockNewsHandler on a free localhost port; yields the base URL."""
+    handler = type("Handler", (MockNewsHandler,), {"latency": latency, "page_cap": page_cap})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/v1/news/all"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_dataset(name, df, workdir, news_url, repeat, config=PROMPT_DEFAULTS, viz_max_bars=VIZ_MAX_BARS,
+                  interval="1d"):
+    """Benchmark every stage on one price series, yielding (stage, measurement) as each finishes."""
+    returns = df["Close"].pct_change().dropna().to_numpy()
+    stages = {
+        "modified_z_score": lambda: modified_z_score(returns),
+        "detect_anomalies_mad": lambda: detect_anomalies_mad(df, config["mad_threshold"]),
+        "detect_rolling_trend_anomalies": lambda: detect_rolling_trend_anomalies(
+            df, config["rolling_window"], config["rolling_threshold"]),
+        "detect_extreme_multi_day_anomalies": lambda: detect_extreme_multi_day_anomalies(
+            df, config["extreme_window"], config["extreme_threshold"]),
+        "detect_persistent_run_anomalies": lambda: detect_persistent_run_anomalies(
+            df, config["persistent_min_days"], config["persistent_threshold"]),
+        "detect_all_anomalies": lambda: detect_all_anomalies(df, config=config),
+    }
+    for stage, fn in stages.items():
+        yield stage, measure(fn, repeat)
+
+    dates = _anomaly_dates(detect_all_anomalies(df, config=config), interval, tz=df.index.tz)
+    # Headlines are per day, so intraday bar keys collapse to their date
+    all_dates = sorted({d[:10] for keys in dates.values() for d in keys})
+
+    if news_url:
+        def news():
+            cache = NewsCache(os.path.join(tempfile.mkdtemp(dir=workdir), "news.sqlite"))
+            try:
+                return fetch_news_for_anomalies(name, all_dates, api_key="bench", cache=cache, base_url=news_url)
+            finally:
+                cache.close()
+        yield "fetch_news_for_anomalies", measure(news, repeat)
+
+    if len(df) > viz_max_bars:
+        return
+    news_by_date = {d: ["Benchmark headline"] for d in all_dates}
+    news_json = os.path.join(workdir, f"{name}_news.json")
+    with open(news_json, "w") as f:
+        json.dump(news_by_date, f)
+
+    yield "build_figure", measure(lambda: build_figure(df, news_by_date, name, interval=interval, **dates), repeat)
+
+    def write_html():
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            generate_visualization(news_json=news_json, ticker=name, price_df=df, auto_open=False,
+                                   interval=interval, **dates)
+        finally:
+            os.chdir(cwd)
+    yield "generate_visualization", measure(write_html, repeat)
+
+
+def compare(results, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """
+    Compare a run against a saved baseline.
+
+    Returns:
+        List of human-readable regression lines (empty if nothing regressed).
+        Stages missing from the baseline are ignored.
+    """
+    regressions = []
+    for key, now in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        slower = now["seconds"] - base["seconds"]
+        if slower > NOISE_FLOOR and now["seconds"] > base["seconds"] * (1 + time_tolerance):
+            regressions.append(f"{key}: {base['seconds'] * 1e3:.1f} ms -> {now['seconds'] * 1e3:.1f} ms")
+        if base["peak_bytes"] and now["peak_bytes"] > base["peak_bytes"] * (1 + memory_tolerance):
+            regressions.append(f"{key}: peak {base['peak_bytes'] / 2**20:.1f} MB -> {now['peak_bytes'] / 2**20:.1f} MB")
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer, visualizer and news pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SIZES),
+                        help="Synthetic series lengths in bars")
+    parser.add_argument("--no-bundled", action="store_true", help="Skip data/*_history.csv")
+    parser.add_argument("--no-news", action="store_true", help="Skip the mock-server news stage")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (best is kept)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--out", help="Also write this run's results to a JSON file")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--viz-max-bars", type=int, default=VIZ_MAX_BARS,
+                        help="Skip chart stages for longer series")
+    parser.add_argument("--latency", type=float, default=MOCK_LATENCY, help="Mock news server latency (s)")
+    args = parser.parse_args(argv)
+
+    # Keep the news stage offline and deterministic: fixed company names and
+    # no client-side rate limit against the local mock server.
+    workdir = tempfile.mkdtemp(prefix="anomaly-bench-")
+    ticker_meta._default_cache = ticker_meta.TickerMetaCache(
+        os.path.join(workdir, "meta.sqlite"),
+        lookup=lambda t: {"name": t, "exchange": None, "currency": None},
+    )
+    newsapi_fetcher._limiter = TokenBucket(rate=1e9, burst=newsapi_fetcher.MAX_WORKERS)
+
+    results = {}
+    data_dir = "data" if not args.no_bundled else os.path.join(workdir, "none")
+    news = contextlib.nullcontext(None) if args.no_news else mock_news_server(args.latency)
+    print(f"{'dataset':<22}{'bars':>10}  {'stage':<36}{'ms':>10}{'peak MB':>10}{'blocks':>9}")
+    with news as news_url:
+        for name, df, interval in datasets(args.sizes, data_dir):
+            for stage, m in bench_dataset(name, df, workdir, news_url, args.repeat,
+                                          viz_max_bars=args.viz_max_bars, interval=interval):
+                results[f"{name}/{stage}"] = m
+                print(f"{name:<22}{len(df):>10}  {stage:<36}{m['seconds'] * 1e3:>10.2f}"
+                      f"{m['peak_bytes'] / 2**20:>10.2f}{m['blocks']:>9}", flush=True)
+
+    run = {"environment": environment(), "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(run, f, indent=2)
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            status = 1
+        else:
+            print(f"✅ No regressions against {args.baseline}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import argparse
+import glob
+import os
+import sys
+
+# Self-checks for behaviour that has to stay fixed. Each check raises
+# AssertionError with a short explanation when it fails.
+CHECKS = {}
+DATA_DIR = "data"
+# Detector configs compared against the reference detectors: analyzer's
+# defaults, the app's slider defaults and a looser grid point
+DETECTOR_CONFIGS = (
+    {"mad_threshold": 3.5, "rolling_window": 5, "rolling_threshold": 3.5, "extreme_window": 3,
+     "extreme_threshold": 3.5, "persistent_min_days": 7, "persistent_threshold": 3.5},
+    {"mad_threshold": 2.5, "rolling_window": 5, "rolling_threshold": 2.0, "extreme_window": 3,
+     "extreme_threshold": 2.5, "persistent_min_days": 7, "persistent_threshold": 0.5},
+    {"mad_threshold": 2.0, "rolling_window": 10, "rolling_threshold": 1.5, "extreme_window": 5,
+     "extreme_threshold": 2.0, "persistent_min_days": 4, "persistent_threshold": 1.0},
+)
+
+
+def check(fn):
+    CHECKS[fn.__name__.removeprefix("check_")] = fn
+    return fn
+
+
+@check
+def check_news_paging_capped():
+    """Ranged news lookups must not mark dates empty when the plan caps the page size."""
+    from scripts.benchmark import mock_news_server
+    from scripts.news_planner import fetch_range_members
+    from scripts.newsapi_fetcher import get_newsapi_news, get_newsapi_news_range
+
+    dates = ["2024-03-04", "2024-03-06"]
+    for cap in (3, None):
+        with mock_news_server(latency=0, page_cap=cap) as url:
+            def fetch_range(start, end):
+                return get_newsapi_news_range("Apple", start, end, api_key="check", base_url=url)
+
+            def fetch_day(date):
+                return get_newsapi_news("Apple", date, api_key="check", base_url=url)
+
+            bulk = fetch_range_members(dates[0], dates[-1], dates, fetch_range, fetch_day)
+            single = {date: fetch_day(date) for date in dates}
+        for date in dates:
+            assert bulk[date] == single[date] and len(bulk[date]) == 3, \
+                f"page cap {cap}: {date} got {len(bulk[date] or [])} headlines in bulk mode, expected 3"
+
+
+# Reference detectors: the loop-based versions the vectorized ones replaced
+# (user-002, user-016), kept only to check them against. The persistent
+# reference closes the final run with its own bounds; the original reused
+# the previous run's end_date there.
+def _reference_mad(df, threshold):
+    from scripts.analyzer import modified_z_score
+
+    df = df.copy()
+    df["Return"] = df["Close"].pct_change()
+    z_scores = modified_z_score(df["Return"].dropna().values)
+    df = df.iloc[1:].copy()
+    df["ModifiedZ"] = z_scores
+    return df[df["ModifiedZ"].abs() > threshold][["Close", "Return", "ModifiedZ"]]
+
+
+def _reference_rolling(df, window, threshold):
+    import numpy as np
+    import pandas as pd
+    from scripts.analyzer import ROLLING_LOOKBACK
+    from scripts.rolling_stats import rolling_median_mad
+
+    df = df.copy()
+    df["RollingReturn"] = df["Close"].pct_change(periods=window)
+    df = df.dropna(subset=["RollingReturn"]).copy()
+    df["Median"], df["MAD"] = rolling_median_mad(df["RollingReturn"].to_numpy(), ROLLING_LOOKBACK)
+    df["ModifiedZ"] = 0.6745 * (df["RollingReturn"] - df["Median"]) / df["MAD"].replace(0, np.nan)
+    anomalies = df[df["ModifiedZ"].abs() > threshold].copy()
+    anomalies["AnomalyDate"] = pd.to_datetime(anomalies.index, utc=True)
+
+    grouped = []
+    last_date = None
+    for date in anomalies["AnomalyDate"]:
+        if last_date is None or (date - last_date).days >= window:
+            grouped.append(date)
+            last_date = date
+    collapsed = anomalies[anomalies["AnomalyDate"].isin(grouped)]
+    return collapsed[["AnomalyDate", "RollingReturn"]]
+
+
+def _reference_extreme(df, window, threshold, min_gap_days):
+    import numpy as np
+    import pandas as pd
+    from scripts.analyzer import modified_z_score
+
+    returns = df["Close"].pct_change()
+    rolling = (1 + returns).rolling(window=window).apply(lambda x: x.prod() - 1, raw=True).dropna()
+    z = modified_z_score(rolling.values)
+
+    pruned = []
+    last = None
+    for d in sorted(rolling.index[np.abs(z) > threshold]):
+        if last is None or (d - last).days >= min_gap_days:
+            pruned.append(d)
+            last = d
+    anomalies = pd.DataFrame({"AnomalyDate": pruned, "RollingReturn": [rolling.loc[d] for d in pruned]})
+    try:
+        anomalies["AnomalyDate"] = anomalies["AnomalyDate"].dt.tz_localize(None)
+    except (AttributeError, ValueError):
+        pass
+    return anomalies
+
+
+def _reference_persistent(df, min_days, threshold):
+    import numpy as np
+    import pandas as pd
+    from scripts.analyzer import modified_z_score
+
+    returns = df["Close"].pct_change()
+    runs = []
+    direction, start_idx, run_returns = 0, 0, []
+    for i in range(1, len(df)):
+        ret = returns.iat[i]
+        curr_dir = 1 if ret > 0 else (-1 if ret < 0 else 0)
+        if direction == 0 or (curr_dir != direction and curr_dir != 0):
+            if direction != 0:
+                runs.append((start_idx, i - 1, run_returns))
+            direction = curr_dir
+            start_idx = i - 1
+            run_returns = [ret] if ret != 0 else []
+        elif ret != 0:
+            run_returns.append(ret)
+    runs.append((start_idx, len(df) - 1, run_returns))
+
+    runs = [(start, end, np.prod([1 + r for r in rets]) - 1)
+            for start, end, rets in runs if end - start + 1 >= min_days]
+    columns = ["start_date", "end_date", "cumulative_return", "direction"]
+    if not runs:
+        return pd.DataFrame(columns=columns)
+    run_z = modified_z_score(np.array([cum for _, _, cum in runs]))
+    return pd.DataFrame([
+        {"start_date": df.index[start], "end_date": df.index[end], "cumulative_return": cum,
+         "direction": "up" if cum > 0 else "down"}
+        for (start, end, cum), z in zip(runs, run_z) if abs(z) > threshold
+    ], columns=columns)
+
+
+@check
+def check_detectors_match_reference():
+    """The vectorized detectors must reproduce the loop-based ones on every data/*_history.csv."""
+    import pandas as pd
+    from scripts.analyzer import DEFAULT_MIN_GAP_DAYS, detect_all_anomalies
+    from scripts.price_io import read_price_csv
+
+    paths = sorted(glob.glob(os.path.join(DATA_DIR, "*_history.csv")))
+    assert paths, f"no *_history.csv files in {DATA_DIR}/"
+    for path in paths:
+        df = read_price_csv(path)
+        for config in DETECTOR_CONFIGS:
+            found = detect_all_anomalies(df, config)
+            expected = {
+                "mad": _reference_mad(df, config["mad_threshold"]),
+                "rolling": _reference_rolling(df, config["rolling_window"], config["rolling_threshold"]),
+                "extreme": _reference_extreme(df, config["extreme_window"], config["extreme_threshold"],
+                                              DEFAULT_MIN_GAP_DAYS),
+                "persistent": _reference_persistent(df, config["persistent_min_days"],
+                                                    config["persistent_threshold"]),
+            }
+            for detector, want in expected.items():
+                # Extreme ModifiedZ is left out: the loop read it at the wrong position (see user-016)
+                got = found[detector][want.columns]
+                try:
+                    pd.testing.assert_frame_equal(got.reset_index(drop=True), want.reset_index(drop=True),
+                                                  check_dtype=False, check_index_type=False)
+                    pd.testing.assert_index_equal(got.index, want.index, exact=False)
+                except AssertionError as e:
+                    raise AssertionError(f"{os.path.basename(path)} {detector} {config}: {e}") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the project's self-checks.")
+    parser.add_argument("names", nargs="*", help=f"Checks to run (default: all of {', '.join(CHECKS)})")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name in args.names or CHECKS:
+        try:
+            CHECKS[name]()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+    if failed:
+        print(f"❌ {failed} check(s) failed")
+        return 1
+    print("✅ All checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
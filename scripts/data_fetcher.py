@@ -1,20 +1,35 @@
-import yfinance as yf
-import os
+from scripts.history_store import HistoryStore
+from scripts.metrics import span
+from scripts.price_io import history_path, save_prices
 
-def fetch_and_save_stock_data(ticker: str, period="1y", interval="1d"):
+def fetch_and_save_stock_data(ticker: str, period="1y", interval="1d", store=None, base=None):
+    """
+    Load `period` of `interval` bars for `ticker` through the local history
+    store and write them to data/{ticker}_history (data/{ticker}_{interval}_history
+    for intraday bars) in the columnar format that
+    scripts.price_io.load_price_history reads.
+
+    Only the range missing from the store is downloaded; pass `store` to use
+    a different location or price source. With a finer `base` interval
+    (e.g. base='1m', interval='1h') the base bars are fetched and `interval`
+    is read from the store's pre-aggregated pyramid.
+    """
     print(f"Fetching data for {ticker}...")
-    stock = yf.Ticker(ticker)
-    df = stock.history(period=period, interval=interval)
+    store = store or HistoryStore()
+    if base and base != interval:
+        df = store.get_level(ticker, interval, period=period, interval=base)
+    else:
+        df = store.get(ticker, period=period, interval=interval)
 
-    if df.empty:
+    if df is None or df.empty:
         print("No data found.")
-        return
+        return None
 
-    os.makedirs("../data", exist_ok=True)
-    path = f"data/{ticker}_history.csv" 
-    os.makedirs("data", exist_ok=True)
-    df.to_csv(path)
+    path = history_path(ticker, interval=interval)
+    with span("save", ticker=ticker):
+        save_prices(df, path)
     print(f"Saved {ticker} data to {path}")
+    return df
 
 # Example usage
 if __name__ == "__main__":
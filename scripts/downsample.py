@@ -0,0 +1,102 @@
+import numpy as np
+
+# Point budget for the drawn price line; longer series are decimated
+DEFAULT_MAX_POINTS = 2000
+# Each finer decimation level holds this many times more points than the previous one
+LEVEL_FACTOR = 4
+# The drawn line plus two finer levels: zooming goes down to 1/16 of the range
+# at full budget, and the levels embedded in a chart stay a few hundred KB
+MAX_LEVELS = 3
+
+
+def minmax_indices(y, n_out):
+    """
+    Per-bucket min/max decimation.
+
+    Splits `y` into about n_out / 2 equal buckets and keeps the lowest and
+    highest point of each, so spikes survive at any zoom level.
+
+    Returns:
+        Sorted positional indices into `y`, always including the first and last point.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    size = int(np.ceil(n / max(n_out // 2, 1)))
+    buckets = int(np.ceil(n / size))
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.nanargmin(padded, axis=1)
+    highs = offsets + np.nanargmax(padded, axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def lttb_indices(y, n_out):
+    """
+    Largest-Triangle-Three-Buckets decimation over evenly spaced bars.
+
+    Returns:
+        Sorted positional indices into `y` (n_out of them), always including
+        the first and last point.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket (or the last point for the final bucket)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = (nlo + nhi - 1) / 2.0
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+        xs = np.arange(lo, hi)
+        area = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_indices(y, n_out=DEFAULT_MAX_POINTS, method="minmax", keep=None):
+    """
+    Pick at most about `n_out` points of `y` to draw, plus every index in `keep`.
+
+    Args:
+        y: 1D array of values.
+        n_out: Target number of points.
+        method: 'minmax' (vectorized, keeps extremes) or 'lttb'.
+        keep: Positional indices that must survive, e.g. anomaly dates.
+    Returns:
+        Sorted, unique positional indices.
+    """
+    pick = lttb_indices if method == "lttb" else minmax_indices
+    idx = pick(y, n_out)
+    if keep is not None and len(keep):
+        idx = np.union1d(idx, np.asarray(keep, dtype=int))
+    return idx
+
+
+def decimation_levels(y, n_out=DEFAULT_MAX_POINTS, method="minmax", keep=None,
+                      factor=LEVEL_FACTOR, max_levels=MAX_LEVELS):
+    """
+    Build coarse-to-fine decimation levels for zoomable charts.
+
+    Level k targets n_out * factor**k points; the list stops once a level
+    holds the whole series or after `max_levels` levels.
+
+    Returns:
+        List of index arrays, coarsest first.
+    """
+    levels = []
+    for k in range(max_levels):
+        target = n_out * factor ** k
+        levels.append(downsample_indices(y, target, method=method, keep=keep))
+        if target >= len(y):
+            break
+    return levels
@@ -0,0 +1,344 @@
+import json
+import os
+import time
+
+import pandas as pd
+
+from scripts.bars import MAX_LOOKBACK, PYRAMID_LEVELS, build_pyramid, interval_ns, is_intraday, update_pyramid
+from scripts.metrics import span
+from scripts.price_io import load_prices, save_prices, write_json
+from scripts.price_sources import YFinanceSource
+
+STORE_DIR = "data/store"
+# Skip refreshing the tail of a series that was checked this recently (seconds)
+DEFAULT_MAX_AGE = 15 * 60
+# Tickers per source call in get_many(), and how often tickers missing from a batch are retried
+BATCH_SIZE = 50
+BATCH_RETRIES = 2
+BATCH_RETRY_DELAY = 1.0
+
+
+def period_start(period, now=None):
+    """
+    Translate a yfinance-style period ('5d', '6mo', '1y', 'ytd', 'max') into
+    the first timestamp it covers. Returns None for 'max'.
+    """
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+    if now.tzinfo is None:
+        now = now.tz_localize("UTC")
+    period = period.strip().lower()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return now.normalize().replace(month=1, day=1)
+    for suffix, unit in (("mo", "months"), ("y", "years"), ("wk", "weeks"), ("d", "days")):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return (now - pd.DateOffset(**{unit: int(period[:-len(suffix)])})).normalize()
+    raise ValueError(f"Unsupported period: {period!r}")
+
+
+def clamp_period(period, interval, now=None):
+    """Shorten `period` to the furthest lookback the source serves for `interval` (see MAX_LOOKBACK)."""
+    limit = MAX_LOOKBACK.get(interval)
+    if limit is None:
+        return period
+    start = period_start(period, now)
+    if start is None or start < period_start(limit, now):
+        return limit
+    return period
+
+
+class HistoryStore:
+    """
+    Local, append-only store of price histories per (ticker, interval).
+
+    Each series lives in `{root}/{ticker}_{interval}/` (the columnar format of
+    scripts/price_io.py) with a small `{ticker}_{interval}.json`
+    sidecar recording the earliest start already requested, the last bar
+    and when the tail was last refreshed. `get()` only asks the source for
+    the ranges the store does not cover yet; `get_many()` does the same
+    for a list of tickers with batched source calls.
+
+    Intraday series also keep a pyramid of coarser OHLC levels
+    (PYRAMID_LEVELS) in `{root}/{ticker}_{interval}_pyramid/{level}/`,
+    updated whenever the base series is written, so `read_level()` and
+    `get_level()` serve 5m/1h/1d bars without fetching or resampling again.
+    """
+
+    def __init__(self, root=STORE_DIR, source=None, max_age=DEFAULT_MAX_AGE):
+        self.root = root
+        self.source = source or YFinanceSource()
+        self.max_age = max_age
+
+    def _path(self, ticker, interval, ext=None):
+        name = f"{ticker}_{interval}"
+        return os.path.join(self.root, f"{name}.{ext}" if ext else name)
+
+    def read_meta(self, ticker, interval="1d"):
+        path = self._path(ticker, interval, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def read(self, ticker, interval="1d"):
+        """Return the stored series, or None if nothing is stored yet."""
+        meta = self.read_meta(ticker, interval)
+        path = self._path(ticker, interval)
+        if meta is None or not os.path.exists(path):
+            return None
+        return load_prices(path)
+
+    def _pyramid_path(self, ticker, interval, level):
+        return os.path.join(self.root, f"{ticker}_{interval}_pyramid", level)
+
+    def _write_pyramid(self, ticker, interval, df, since=None):
+        # Re-aggregate only the bins touched since `since`; None rebuilds every level
+        levels = [lvl for lvl in PYRAMID_LEVELS if os.path.exists(self._pyramid_path(ticker, interval, lvl))]
+        if since is None or len(levels) < len(PYRAMID_LEVELS):
+            pyramid = build_pyramid(df, interval)
+        else:
+            old = {lvl: load_prices(self._pyramid_path(ticker, interval, lvl), mmap=False) for lvl in levels}
+            pyramid = update_pyramid(old, df, interval, since)
+        for level, bars in pyramid.items():
+            if level != interval:
+                save_prices(bars, self._pyramid_path(ticker, interval, level))
+
+    def _write(self, ticker, interval, df, start, since=None, checked_at=None):
+        # checked_at: when the latest bars were last asked for (None: now)
+        os.makedirs(self.root, exist_ok=True)
+        save_prices(df, self._path(ticker, interval))
+        if is_intraday(interval):
+            self._write_pyramid(ticker, interval, df, since)
+        meta = {
+            "start": None if start is None else start.isoformat(),
+            "last_bar": df.index[-1].isoformat(),
+            "rows": len(df),
+            "tz": str(df.index.tz or "UTC"),
+            "checked_at": time.time() if checked_at is None else checked_at,
+        }
+        write_json(self._path(ticker, interval, "json"), meta)
+
+    def _fetch(self, ticker, interval, start, end):
+        print(f"📥 Fetching {ticker} {interval} bars from {start or 'first bar'} to {end or 'now'}...")
+        with span("fetch", source=type(self.source).__name__, ticker=ticker, interval=interval):
+            df = self.source.history(ticker, interval=interval, start=start, end=end)
+        if df is None or df.empty:
+            return None
+        df.index.name = "Date"
+        return df
+
+    def _missing(self, ticker, interval, start):
+        """
+        Work out which ranges a request from `start` needs from the source.
+
+        Returns:
+            (stored, meta, ranges): the stored series and sidecar (None if
+            nothing is stored) and a list of (kind, start, end) ranges, where
+            kind is 'full' (nothing stored), 'head' (older bars) or 'tail'
+            (bars since the last stored one).
+        """
+        stored = self.read(ticker, interval)
+        if stored is None or stored.empty:
+            return None, None, [("full", start, None)]
+        meta = self.read_meta(ticker, interval)
+        ranges = []
+        covered = None if meta["start"] is None else pd.Timestamp(meta["start"])
+        # Head: the requested period reaches further back than anything fetched so far
+        if covered is not None and (start is None or start < covered):
+            ranges.append(("head", start, covered))
+        # Tail: bars since the last stored one, unless we checked very recently
+        if time.time() - meta.get("checked_at", 0) >= self.max_age:
+            ranges.append(("tail", stored.index[-1], None))
+        return stored, meta, ranges
+
+    def _merge(self, ticker, interval, stored, meta, fetched, start):
+        """
+        Combine stored bars with `fetched` ({kind: DataFrame or None} for each
+        range that was requested) and write the result back.
+
+        Returns:
+            The full series, or None if nothing is stored or fetched.
+        """
+        if stored is None:
+            df = fetched.get("full")
+            if df is None:
+                return None
+            self._write(ticker, interval, df, start)
+            return df
+        if not fetched:
+            return stored
+
+        frames = [stored]
+        since = stored.index[-1]
+        covered = None if meta["start"] is None else pd.Timestamp(meta["start"])
+        if "head" in fetched:
+            if fetched["head"] is not None:
+                frames.insert(0, fetched["head"])
+            covered = start
+            since = None
+        if fetched.get("tail") is not None:
+            frames.append(fetched["tail"])
+
+        tz = stored.index.tz
+        df = pd.concat([f.tz_convert(tz) if f.index.tz is not None else f for f in frames])
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        # A head-only backfill fetched no new bars, so the tail stays as due as it was
+        checked_at = None if "tail" in fetched else meta.get("checked_at", 0)
+        self._write(ticker, interval, df, covered, since, checked_at)
+        return df
+
+    def get(self, ticker, period="1y", interval="1d", now=None):
+        """
+        Return `ticker` bars covering `period`, fetching only what is missing.
+
+        Args:
+            ticker: Symbol to load.
+            period: yfinance-style lookback such as '1y' or '2y'.
+            interval: Bar size, e.g. '1d' or '1h'.
+            now: Reference time for the lookback (defaults to the current time).
+        Returns:
+            DataFrame sliced to the requested period, or None if the source
+            has no data for the ticker.
+        """
+        start = period_start(period, now)
+        stored, meta, ranges = self._missing(ticker, interval, start)
+        fetched = {kind: self._fetch(ticker, interval, lo, hi) for kind, lo, hi in ranges}
+        df = self._merge(ticker, interval, stored, meta, fetched, start)
+        if df is None or start is None:
+            return df
+        return df[df.index >= start]
+
+    def _fetch_batch(self, tickers, interval, start, end):
+        # One source call for many tickers; sources without history_many() are asked one by one
+        with span("fetch", source=type(self.source).__name__, tickers=len(tickers), interval=interval):
+            if hasattr(self.source, "history_many"):
+                return self.source.history_many(tickers, interval=interval, start=start, end=end)
+            frames = {}
+            for ticker in tickers:
+                try:
+                    frames[ticker] = self.source.history(ticker, interval=interval, start=start, end=end)
+                except Exception as e:
+                    print(f"❌ {ticker}: {type(e).__name__}: {e}")
+            return frames
+
+    def _fetch_many(self, tickers, interval, start, end, batch_size, retries, retry_delay):
+        # Fetch in batches; each retry round re-requests only the tickers still missing.
+        # A ticker the source answered for without bars ends up as None in `frames`,
+        # one whose batch raised is left out.
+        frames, errors, answered = {}, {}, {}
+        pending = list(tickers)
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(retry_delay * attempt)
+                print(f"🔁 Retrying {len(pending)} tickers (attempt {attempt + 1}/{retries + 1})...")
+            failed = []
+            for i in range(0, len(pending), batch_size):
+                batch = pending[i:i + batch_size]
+                print(f"📥 Fetching {len(batch)} tickers' {interval} bars from {start or 'first bar'} "
+                      f"to {end or 'now'}...")
+                try:
+                    got, error = self._fetch_batch(batch, interval, start, end), None
+                except Exception as e:
+                    got, error = {}, f"{type(e).__name__}: {e}"
+                for ticker in batch:
+                    df = got.get(ticker)
+                    if df is None or df.empty:
+                        failed.append(ticker)
+                        errors[ticker] = error or "no data returned"
+                        answered[ticker] = error is None
+                    else:
+                        df.index.name = "Date"
+                        frames[ticker] = df
+            pending = failed
+            if not pending:
+                break
+        for ticker in pending:
+            if answered[ticker]:
+                frames[ticker] = None
+        return frames, {ticker: errors[ticker] for ticker in pending}
+
+    def get_many(self, tickers, period="1y", interval="1d", now=None, batch_size=BATCH_SIZE,
+                 retries=BATCH_RETRIES, retry_delay=BATCH_RETRY_DELAY):
+        """
+        Bring many tickers up to date with batched source calls.
+
+        Works out the missing ranges per ticker like get(), then asks the
+        source for up to `batch_size` tickers at a time (one yf.download per
+        batch with the default source). Tail refreshes are pooled into one
+        request from the earliest last bar; overlapping bars are de-duplicated
+        when merged. Tickers a batch returns nothing for are retried in
+        batches of just those tickers, up to `retries` more times.
+
+        Returns:
+            (frames, failed): {ticker: DataFrame sliced to `period`, or None
+            if nothing is stored} and {ticker: error} for tickers that still
+            failed. As in get(), a range the source answered without bars
+            counts as fetched; after a source error the stored bars are kept
+            and the range is asked for again on the next call.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        start = period_start(period, now)
+        plans = {ticker: self._missing(ticker, interval, start) for ticker in tickers}
+
+        groups = {}
+        for ticker, (stored, _, ranges) in plans.items():
+            for kind, lo, hi in ranges:
+                key = (kind, None, None) if kind == "tail" else (kind, lo, hi)
+                groups.setdefault(key, []).append(ticker)
+
+        fetched = {ticker: {} for ticker in tickers}
+        failed = {}
+        for (kind, lo, hi), group in groups.items():
+            if kind == "tail":
+                lo = min(plans[ticker][0].index[-1] for ticker in group)
+            frames, errors = self._fetch_many(group, interval, lo, hi, batch_size, retries, retry_delay)
+            for ticker, df in frames.items():
+                fetched[ticker][kind] = df
+            failed.update(errors)
+
+        results = {}
+        for ticker in tickers:
+            stored, meta, _ = plans[ticker]
+            df = self._merge(ticker, interval, stored, meta, fetched[ticker], start)
+            results[ticker] = df if df is None or start is None else df[df.index >= start]
+        return results, failed
+
+    def read_level(self, ticker, level, interval="1m", period=None, now=None):
+        """
+        Return the stored `level` bars aggregated from the `interval` base series.
+
+        Never fetches. A pyramid missing from an older store is built once
+        from the base series and saved.
+
+        Returns:
+            DataFrame sliced to `period` (all bars if None), or None if the
+            base series is not stored.
+        """
+        if level != interval and (level not in PYRAMID_LEVELS or interval_ns(level) < interval_ns(interval)):
+            raise ValueError(f"{level} bars are not aggregated from {interval} bars")
+        if level == interval:
+            df = self.read(ticker, interval)
+        else:
+            path = self._pyramid_path(ticker, interval, level)
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                base = self.read(ticker, interval)
+                if base is None:
+                    return None
+                self._write_pyramid(ticker, interval, base)
+            df = load_prices(path)
+        if df is None or period is None:
+            return df
+        start = period_start(period, now)
+        return df if start is None else df[df.index >= start]
+
+    def get_level(self, ticker, level, period="5d", interval="1m", now=None):
+        """
+        Bring the `interval` base series up to date and return its `level` bars.
+
+        One fetch of the base serves every coarser level, e.g. 1m bars feed
+        the 5m, 1h and 1d views.
+        """
+        if self.get(ticker, period=period, interval=interval, now=now) is None:
+            return None
+        return self.read_level(ticker, level, interval, period, now)
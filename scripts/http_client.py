@@ -0,0 +1,87 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+from scripts.metrics import span
+
+DEFAULT_TIMEOUT = 10          # seconds, per request
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5         # seconds, doubled after each failed attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Allows bursts of up to `burst` requests and a sustained `rate` requests
+    per second; `acquire()` blocks until a token is available.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(pool_size=10):
+    """Create a requests.Session whose connection pool fits `pool_size` threads."""
+    # requests is imported here so modules that only plan or cache news don't pay for it
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_with_retry(session, url, params=None, timeout=DEFAULT_TIMEOUT,
+                   retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, limiter=None):
+    """
+    GET `url`, retrying on connection errors, timeouts, 429 and 5xx.
+
+    Honours a numeric Retry-After header, otherwise backs off exponentially.
+    Every attempt takes a token from `limiter` if one is given.
+
+    Returns:
+        The last response received, or None if every attempt failed to connect.
+    """
+    import requests
+
+    response = None
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            with span("http_request", host=urlparse(url).netloc) as labels:
+                response = session.get(url, params=params, timeout=timeout)
+                labels["status"] = response.status_code
+        except (requests.ConnectionError, requests.Timeout) as e:
+            print(f"⚠️ Request failed ({type(e).__name__}), attempt {attempt + 1}/{retries + 1}")
+            response = None
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+        if attempt < retries:
+            delay = backoff * (2 ** attempt)
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            time.sleep(delay)
+    return response
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Libraries that take tens to hundreds of milliseconds to import
+HEAVY = ("pandas", "numpy", "yfinance", "plotly", "requests", "streamlit", "dotenv")
+# Module -> (heavy libraries it may load on import, import-time budget in ms).
+# Budgets are generous so the check only trips when a heavy import sneaks in.
+BUDGETS = {
+    "scripts.main": ((), 150),
+    "scripts.worker": ((), 100),
+    "scripts.jobs": ((), 100),
+    "scripts.metrics": ((), 100),
+    "scripts.news_cache": ((), 100),
+    "scripts.news_planner": ((), 100),
+    "scripts.newsapi_fetcher": ((), 100),
+    "scripts.news_fetcher": ((), 100),
+    "scripts.http_client": ((), 100),
+    "scripts.ticker_meta": ((), 100),
+    "scripts.price_sources": (("numpy", "pandas"), 1500),
+    "scripts.history_store": (("numpy", "pandas"), 1500),
+    "scripts.data_fetcher": (("numpy", "pandas"), 1500),
+    "scripts.analyzer": (("numpy", "pandas"), 1500),
+    "scripts.batch": (("numpy", "pandas"), 1500),
+    "scripts.visualize": (("numpy", "pandas", "plotly"), 2000),
+}
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - started) * 1e3,
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module):
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        Dict with the import time in ms and the heavy libraries it loaded.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+                         capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def check(budgets=BUDGETS, repeat=3):
+    """
+    Measure every module in `budgets`, keeping the fastest of `repeat` runs.
+
+    Returns:
+        List of (module, ms, loaded, problems) tuples; `problems` is empty when
+        the module is within budget.
+    """
+    results = []
+    for module, (allowed, budget_ms) in budgets.items():
+        runs = [measure(module) for _ in range(repeat)]
+        ms = min(r["ms"] for r in runs)
+        loaded = runs[0]["loaded"]
+        problems = [f"imports {name}" for name in loaded if name not in allowed]
+        if ms > budget_ms:
+            problems.append(f"{ms:.0f} ms > {budget_ms} ms budget")
+        results.append((module, ms, loaded, problems))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that light modules stay free of heavy imports.")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh imports per module; the fastest counts")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for module, ms, loaded, problems in check(repeat=args.repeat):
+        status = "❌" if problems else "✅"
+        print(f"{status} {module:<26} {ms:>7.1f} ms  {', '.join(loaded) or '-'}"
+              + (f"  ({'; '.join(problems)})" if problems else ""))
+        failed += bool(problems)
+    if failed:
+        print(f"❌ {failed} module(s) over budget")
+        return 1
+    print("✅ All modules within their import budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
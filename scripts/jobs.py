@@ -0,0 +1,138 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Background workers shared by every session of the app
+JOB_WORKERS = 4
+# Finished jobs kept for lookup; the oldest are forgotten first
+MAX_JOBS = 64
+
+
+class Job:
+    """
+    State of one background job.
+
+    The worker reports through update(); readers take a consistent copy with
+    snapshot(). `results` is filled in progressively, so a reader can show
+    partial output (e.g. headlines fetched so far) while the job still runs.
+    """
+
+    def __init__(self, job_id, name=""):
+        self.id = job_id
+        self.name = name
+        self.status = "queued"
+        self.stage = ""
+        self.progress = 0.0
+        self.results = {}
+        self.error = ""
+        self.submitted = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def update(self, stage=None, progress=None, **results):
+        """Record the current stage, progress (0-1) and any new or updated results."""
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if progress is not None:
+                self.progress = progress
+            self.results.update(results)
+
+    def merge(self, key, values):
+        """Add `values` (a dict) into the dict result `key`, e.g. one more date's headlines."""
+        with self._lock:
+            self.results.setdefault(key, {}).update(values)
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def snapshot(self):
+        """Dict copy of the job state; dict results are copied one level deep."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": self.progress,
+                "results": {k: dict(v) if isinstance(v, dict) else v for k, v in self.results.items()},
+                "error": self.error,
+                "seconds": (self.finished or time.time()) - self.submitted,
+            }
+
+
+class JobRunner:
+    """
+    Runs jobs on a thread pool and keeps their state by id.
+
+    A job function is called as fn(job, *args, **kwargs) and reports
+    through job.update(); its return value (a dict, if any) is merged into
+    job.results. Exceptions mark the job as 'error' instead of propagating.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_jobs=MAX_JOBS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._keys = {}
+        self._max_jobs = max_jobs
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, name="", key=None, max_age=None, **kwargs):
+        """
+        Start `fn` in the background and return its Job.
+
+        With a `key`, a job already submitted under the same key is returned
+        instead of starting a new one, unless it failed or, with `max_age`,
+        finished more than `max_age` seconds ago.
+        """
+        with self._lock:
+            if key is not None and key in self._keys:
+                job = self._jobs.get(self._keys[key])
+                fresh = max_age is None or job is None or job.finished is None \
+                    or time.time() - job.finished < max_age
+                if job is not None and job.status != "error" and fresh:
+                    return job
+            job = Job(uuid.uuid4().hex[:12], name)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._keys[key] = job.id
+            self._forget_finished()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _forget_finished(self):
+        # Drop the oldest finished jobs once over the limit; running ones are kept
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self._max_jobs:
+                break
+            if self._jobs[job_id].done:
+                del self._jobs[job_id]
+        live = set(self._jobs)
+        self._keys = {k: v for k, v in self._keys.items() if v in live}
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        job.status = "running"
+        try:
+            result = fn(job, *args, **kwargs)
+            if isinstance(result, dict):
+                job.update(**result)
+            job.update(progress=1.0)
+            status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.update(traceback=traceback.format_exc())
+            status = "error"
+        job.finished = time.time()
+        job.status = status
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
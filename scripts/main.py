@@ -1,75 +1,138 @@
+import argparse
 import os
 import json
-import pandas as pd
-import yfinance as yf
-
-from scripts.data_fetcher import fetch_and_save_stock_data
-from scripts.analyzer import detect_all_anomalies
-from scripts.newsapi_fetcher import get_newsapi_news
-from scripts.visualize import generate_visualization
-
-def get_company_name(ticker):
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Only light modules are imported here: the Streamlit app imports this module for
+# the news step, so pandas, yfinance and plotly are loaded inside run_pipeline().
+from scripts.newsapi_fetcher import (
+    MAX_WORKERS, NEWSAPI_URL, PROVIDER, get_limiter, get_newsapi_news, get_newsapi_news_range
+)
+from scripts.news_planner import fetch_range_members, plan_ranges
+from scripts.metrics import (
+    PROFILE_MODES, get_recorder, profiling, span, summarize, write_json_log, write_prometheus
+)
+from scripts.news_cache import NewsCache
+from scripts.ticker_meta import get_company_name
+
+def fetch_news_for_anomalies(ticker, dates, api_key=None, anomaly_type="default", cache=None,
+                             max_workers=MAX_WORKERS, base_url=NEWSAPI_URL, bulk=True, on_news=None):
+    """
+    Headlines for every anomaly date, as {date: [html link, ...]}.
+
+    `on_news(date, headlines)` is called as soon as each date is known
+    (cached dates first, then as requests complete), so callers can show
+    headlines progressively.
+    """
+    # A cache opened here is closed here; callers that pass one keep ownership
+    own_cache = cache is None
+    cache = NewsCache() if own_cache else cache
     try:
-        return yf.Ticker(ticker).info.get("longName", ticker)
-    except:
-        return ticker  # fallback
-
-from scripts.newsapi_fetcher import get_newsapi_news
-
-def fetch_news_for_anomalies(ticker, dates, api_key, anomaly_type="default"):
-    import yfinance as yf
-    try:
-        company_name = yf.Ticker(ticker).info.get("longName", ticker)
-    except:
-        company_name = ticker  # fallback
-
-    news = {}
-    for date in dates:
-        results = get_newsapi_news(query=company_name, date=date, api_key=api_key)
-        link_color = "white"
-        news[date] = [
-            f"<a href='{a['url']}' target='_blank' style='color:{link_color}; text-decoration:none;'>{a['title']} ({a['source']})</a>"
-            for a in results
-        ] if results else ["No major headlines found."]
+        with span("news", ticker=ticker):
+            return _fetch_news_for_anomalies(ticker, dates, api_key, anomaly_type, cache,
+                                             max_workers, base_url, bulk, on_news)
+    finally:
+        if own_cache:
+            cache.close()
+
+
+def _format_headlines(results):
+    link_color = "white"
+    return [
+        f"<a href='{a['url']}' target='_blank' style='color:{link_color}; text-decoration:none;'>{a['title']} ({a['source']})</a>"
+        for a in results
+    ] if results else ["No major headlines found."]
+
+
+def _fetch_news_for_anomalies(ticker, dates, api_key, anomaly_type, cache, max_workers, base_url, bulk,
+                              on_news=None):
+    # Resolved through the persistent metadata cache: at most one .info call per ticker
+    company_name = get_company_name(ticker)
+
+    api_key = api_key or os.getenv("NEWSAPI_KEY")
+    # Cached lookups (including cached "no news") skip the network entirely
+    found = {date: cache.get(PROVIDER, company_name, date) for date in dates}
+    missing = [date for date, results in found.items() if results is None]
+    if on_news:
+        for date, results in found.items():
+            if results is not None:
+                on_news(date, _format_headlines(results))
+
+    def fetch_day(date):
+        return get_newsapi_news(query=company_name, date=date, api_key=api_key,
+                                base_url=base_url, limiter=get_limiter())
+
+    def fetch_range(start, end):
+        return get_newsapi_news_range(company_name, start, end, api_key=api_key,
+                                      base_url=base_url, limiter=get_limiter())
+
+    def fetch(planned):
+        start, end, members = planned
+        if start == end:
+            return {start: fetch_day(start)}
+        return fetch_range_members(start, end, members, fetch_range, fetch_day)
+
+    # Bulk mode merges nearby dates into a few ranged queries; otherwise one request per date
+    if bulk:
+        jobs = plan_ranges(missing)
+    else:
+        jobs = [(date, date, [date]) for date in missing]
+
+    # Fetch concurrently; the shared token bucket bounds the request rate
+    if jobs:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+            futures = [pool.submit(fetch, planned) for planned in jobs]
+            for future in as_completed(futures):
+                for date, results in future.result().items():
+                    found[date] = results
+                    if results is not None:
+                        cache.set(PROVIDER, company_name, date, results)
+                    if on_news:
+                        on_news(date, _format_headlines(results))
+
+    news = {date: _format_headlines(found[date]) for date in dates}
+    print(f"📰 News cache for {ticker} ({anomaly_type}): {cache.hits} hits, {cache.misses} misses")
     return news
 
 
-def main():
+def run_pipeline():
+    from scripts.analyzer import PROMPT_DEFAULTS, detect_all_anomalies
+    from scripts.bars import INTERVALS, is_intraday
+    from scripts.data_fetcher import fetch_and_save_stock_data
+    from scripts.history_store import clamp_period
+    from scripts.visualize import anomaly_keys, generate_visualization
+
     ticker = input("Enter the stock ticker (e.g., AAPL, MSFT, GOOGL): ").strip().upper()
     print(f"🚀 Starting full pipeline for {ticker}")
+    interval = input(f" • Bar interval {INTERVALS} [default 1d]: ").strip() or "1d"
+    if interval not in INTERVALS:
+        print(f"❌ Unsupported interval {interval!r}")
+        return
+    intraday = is_intraday(interval)
 # anomaly thresholds
     print("Configure anomaly thresholds (press Enter for default):")
-    mad_input        = input(" • 1-day z-score threshold [default 2.5]: ").strip()
-    rolling_input    = input(" • 5-day z-score threshold [default 2.0]: ").strip()
-    extreme_input    = input(" • 3-day z-score threshold [default 2.5]: ").strip()
-    persistent_input = input(" • 7-day z-score threshold [default 0.5]: ").strip()
-
-    mad_threshold        = float(mad_input)        if mad_input else 2.5
-    rolling_threshold    = float(rolling_input)    if rolling_input else 2.0
-    extreme_threshold    = float(extreme_input)    if extreme_input else 2.5
-    persistent_threshold = float(persistent_input) if persistent_input else 0.5
-
-    config = {
-        "mad_threshold":        mad_threshold,
-        "rolling_window":       5,
-        "rolling_threshold":    rolling_threshold,
-        "extreme_window":       3,
-        "extreme_threshold":    extreme_threshold,
-        "persistent_min_days":  7,
-        "persistent_threshold": persistent_threshold,
-    }
+    config = dict(PROMPT_DEFAULTS)
+    prompts = [
+        ("mad_threshold", "1-day"), ("rolling_threshold", "5-day"),
+        ("extreme_threshold", "3-day"), ("persistent_threshold", "7-day"),
+    ]
+    for key, label in prompts:
+        value = input(f" • {label} z-score threshold [default {config[key]}]: ").strip()
+        if value:
+            config[key] = float(value)
+    # Intraday windows and gaps count bars rather than calendar days
+    config["gap_unit"] = "bars" if intraday else "days"
 
     ##### Step 1: Fetch data
     print("📥 Fetching stock data...")
-    fetch_and_save_stock_data(ticker)
-
-    # Load price data once
-    df = pd.read_csv(f"data/{ticker}_history.csv", parse_dates=["Date"])
-    df.set_index("Date", inplace=True)
+    # Price data is loaded once here and shared with the analyzer and visualizer
+    df = fetch_and_save_stock_data(ticker, period=clamp_period("1y", interval), interval=interval)
+    if df is None:
+        print(f"❌ No price data for {ticker}")
+        return
 
     print("Using thresholds:", config)
-    anomalies = detect_all_anomalies(df, config=config)
-
 
     ##### Step 2: Detect anomalies (unified)
     print("🔍 Detecting anomalies...")
@@ -78,25 +141,22 @@ def main():
     # Extract anomaly date lists
     # 1-day MAD anomalies
     anomalies_df = anomalies["mad"]
-    anomaly_dates = pd.to_datetime(anomalies_df.index, utc=True).strftime("%Y-%m-%d").tolist()
+    anomaly_dates = anomaly_keys(anomalies_df.index, intraday)
 
     # Rolling trend anomalies
     trend_df = anomalies["rolling"]
-    trend_df["AnomalyDate"] = pd.to_datetime(trend_df["AnomalyDate"], utc=True)
-    trend_dates = trend_df["AnomalyDate"].dt.strftime("%Y-%m-%d").tolist()
+    trend_dates = anomaly_keys(trend_df["AnomalyDate"], intraday)
 
-    # Extreme multi-day anomalies
+    # Extreme multi-day anomalies (naive timestamps in the price index's timezone)
     extreme_df = anomalies["extreme"]
-    extreme_df["AnomalyDate"] = pd.to_datetime(extreme_df["AnomalyDate"], utc=True)
-    extreme_dates = extreme_df["AnomalyDate"].dt.strftime("%Y-%m-%d").tolist()
+    extreme_dates = anomaly_keys(extreme_df["AnomalyDate"], intraday, tz=df.index.tz)
 
     # Persistent run anomalies (use start_date for news)
     persistent_df = anomalies["persistent"]
     print("Persistent run anomaly columns:", persistent_df.columns)
     print(persistent_df.head())
     if not persistent_df.empty:
-        persistent_df["start_date"] = pd.to_datetime(persistent_df["start_date"], utc=True)
-        persistent_dates = persistent_df["start_date"].dt.strftime("%Y-%m-%d").tolist()
+        persistent_dates = anomaly_keys(persistent_df["start_date"], intraday)
     else:
         persistent_dates = []
 
@@ -110,14 +170,11 @@ def main():
 
     ###### Step 6: Combine dates & fetch news
     print("📰 Fetching news for anomalies...")
-    all_anomaly_dates = sorted(set(anomaly_dates + trend_dates + extreme_dates + persistent_dates))
+    # Headlines are per day, so intraday bar keys collapse to their date
+    all_anomaly_dates = sorted({d[:10] for d in anomaly_dates + trend_dates + extreme_dates + persistent_dates})
 
-    news_z       = fetch_news_for_anomalies(ticker, anomaly_dates, anomaly_type="z")
-    news_trend   = fetch_news_for_anomalies(ticker, trend_dates,   anomaly_type="trend")
-    news_extreme = fetch_news_for_anomalies(ticker, extreme_dates, anomaly_type="extreme")
-    news_run     = fetch_news_for_anomalies(ticker, persistent_dates, anomaly_type="run")
-
-    news_by_date = {**news_z, **news_trend, **news_extreme, **news_run}
+    # One call for every anomaly type: the headlines for a date don't depend on its type
+    news_by_date = fetch_news_for_anomalies(ticker, all_anomaly_dates, anomaly_type="all")
     news_path = f"data/{ticker}_news.json"
     with open(news_path, "w") as f:
         json.dump(news_by_date, f, indent=2)
@@ -126,16 +183,47 @@ def main():
     ##### Step 7: Visualize
     print("📊 Creating interactive chart...")
     generate_visualization(
-        price_csv=f"data/{ticker}_history.csv",
+        price_df=df,
         news_json=news_path,
         ticker=ticker,
         z_anomalies=anomaly_dates,
         trend_anomalies=trend_dates,
         extreme_anomalies=extreme_dates,
-        run_anomalies=persistent_dates
+        run_anomalies=persistent_dates,
+        interval=interval
     )
 
     print("✅ Done! Chart saved in /plots")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect anomalies for one ticker and explain them with news.")
+    parser.add_argument("--metrics-json", help="Append per-stage timing spans to this JSON-lines file")
+    parser.add_argument("--metrics-prom", help="Write per-stage totals to this Prometheus text file")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="Profile the whole run")
+    args = parser.parse_args(argv)
+
+    # NEWSAPI_KEY may live in .env
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    mark = time.time()
+    with profiling(args.profile) as profile:
+        run_pipeline()
+
+    spans = get_recorder().since(mark)
+    print("⏱️ Stage timings:")
+    for t in summarize(spans):
+        print(f"   {t['span']:<14} {t['seconds'] * 1e3:>9.1f} ms  ({t['count']}x)")
+    if args.metrics_json:
+        write_json_log(args.metrics_json, spans)
+        print(f"📝 Spans appended to {args.metrics_json}")
+    if args.metrics_prom:
+        write_prometheus(args.metrics_prom)
+        print(f"📝 Prometheus metrics written to {args.metrics_prom}")
+    if profile.summary:
+        print(f"🔬 {args.profile} profile" + (f" (saved to {profile.path})" if profile.path else "") + ":")
+        print(profile.summary)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
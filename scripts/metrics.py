@@ -0,0 +1,231 @@
+import contextlib
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+PROFILE_DIR = "data/profiles"
+# Rows shown in the profile summaries
+PROFILE_TOP = 25
+# Spans kept in memory; long-running processes (Streamlit) drop the oldest
+MAX_SPANS = 10_000
+
+# tracemalloc is process-wide: one profiling() block traces at a time
+_tracemalloc_lock = threading.Lock()
+# Tells apart .prof files saved within the same second
+_profile_ids = itertools.count(1)
+
+
+class Recorder:
+    """
+    Thread-safe collector of timed spans.
+
+    Each span is a dict with 'name', 'labels', 'start' (epoch seconds),
+    'seconds' and 'ok' (False if the block raised). Only the last
+    `max_spans` spans are kept.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+
+    def since(self, mark):
+        """Spans recorded after `mark` (a float from time.time())."""
+        with self._lock:
+            return [s for s in self.spans if s["start"] >= mark]
+
+    def totals(self):
+        """Aggregate spans by (name, labels) into {'count', 'seconds', 'errors'}."""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            key = (s["name"], tuple(sorted(s["labels"].items())))
+            t = totals.setdefault(key, {"count": 0, "seconds": 0.0, "errors": 0})
+            t["count"] += 1
+            t["seconds"] += s["seconds"]
+            t["errors"] += not s["ok"]
+        return totals
+
+
+_recorder = Recorder()
+
+
+def get_recorder():
+    return _recorder
+
+
+@contextlib.contextmanager
+def span(name, **labels):
+    """
+    Time the enclosed block and record it under `name` with optional labels.
+
+    Yields the labels dict, so the block can add labels it only learns
+    while running (e.g. an HTTP status).
+
+    Example:
+        with span("detect", detector="mad"):
+            ...
+    """
+    start = time.time()
+    t0 = time.perf_counter()
+    ok = True
+    labels = dict(labels)
+    try:
+        yield labels
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        _recorder.add({
+            "name": name,
+            "labels": {k: str(v) for k, v in labels.items()},
+            "start": start,
+            "seconds": time.perf_counter() - t0,
+            "ok": ok,
+        })
+
+
+def summarize(spans):
+    """Total seconds and call count per span name, slowest first."""
+    totals = {}
+    for s in spans:
+        t = totals.setdefault(s["name"], {"span": s["name"], "count": 0, "seconds": 0.0})
+        t["count"] += 1
+        t["seconds"] += s["seconds"]
+    return sorted(totals.values(), key=lambda t: -t["seconds"])
+
+
+def write_json_log(path, spans=None):
+    """Append spans (default: every recorded one) to `path` as one JSON object per line."""
+    spans = _recorder.since(0) if spans is None else spans
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        for s in spans:
+            f.write(json.dumps(s) + "\n")
+
+
+def _prom_labels(name, labels):
+    def escape(v):
+        return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    pairs = [("span", name)] + list(labels)
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def prometheus_text(recorder=None):
+    """Render span totals in the Prometheus text exposition format."""
+    recorder = recorder or _recorder
+    totals = recorder.totals()
+    lines = [
+        "# HELP anomaly_span_seconds Time spent in pipeline spans.",
+        "# TYPE anomaly_span_seconds summary",
+    ]
+    for (name, labels), t in sorted(totals.items()):
+        lines.append(f"anomaly_span_seconds_sum{_prom_labels(name, labels)} {t['seconds']:.6f}")
+        lines.append(f"anomaly_span_seconds_count{_prom_labels(name, labels)} {t['count']}")
+    lines += [
+        "# HELP anomaly_span_errors_total Spans that raised an exception.",
+        "# TYPE anomaly_span_errors_total counter",
+    ]
+    for (name, labels), t in sorted(totals.items()):
+        lines.append(f"anomaly_span_errors_total{_prom_labels(name, labels)} {t['errors']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, recorder=None):
+    """Write span totals to a Prometheus text file (e.g. for node_exporter's textfile collector)."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text(recorder))
+    os.replace(tmp, path)
+
+
+class Profile:
+    """Result of a profiling() block: `summary` text and, for cProfile, the .prof `path`."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.summary = ""
+        self.path = None
+
+
+@contextlib.contextmanager
+def profiling(mode=None, out_dir=PROFILE_DIR, top=PROFILE_TOP, name="profile"):
+    """
+    Optionally profile the enclosed block.
+
+    cProfile only sees the thread that enters the block, so profile work
+    where it runs (e.g. inside a background job), not where it is awaited.
+    tracemalloc is process-wide: its figures include every thread's
+    allocations, and while one block traces, another 'tracemalloc' block
+    runs unprofiled and says so in its summary.
+
+    Args:
+        mode: None (no-op), 'cprofile' (cumulative-time table, stats saved
+            to `out_dir`) or 'tracemalloc' (peak memory and top allocation sites).
+        name: Prefix of the saved .prof file.
+    Yields:
+        A Profile whose `summary` is filled in when the block exits.
+    """
+    if mode not in (None,) + PROFILE_MODES:
+        raise ValueError(f"profile mode must be one of {PROFILE_MODES}, got {mode!r}")
+    result = Profile(mode)
+    if mode is None:
+        yield result
+        return
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            os.makedirs(out_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            result.path = os.path.join(out_dir, f"{name}-{stamp}-{next(_profile_ids)}.prof")
+            profiler.dump_stats(result.path)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            result.summary = out.getvalue()
+        return
+
+    if not _tracemalloc_lock.acquire(blocking=False):
+        result.summary = "not profiled: another block is already tracing memory"
+        yield result
+        return
+    try:
+        if tracemalloc.is_tracing():
+            result.summary = "not profiled: tracemalloc was already started outside profiling()"
+            yield result
+            return
+        tracemalloc.start()
+        try:
+            yield result
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:top]
+            tracemalloc.stop()
+            lines = [f"current {current / 2**20:.1f} MB, peak {peak / 2**20:.1f} MB (whole process)"]
+            lines += [str(stat) for stat in stats]
+            result.summary = "\n".join(lines)
+    finally:
+        _tracemalloc_lock.release()
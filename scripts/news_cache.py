@@ -0,0 +1,80 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "data/news_cache.sqlite"
+# How long results fetched while their date was recent stay fresh (seconds)
+DEFAULT_TTL = 6 * 3600
+# Dates within this many days of today are still "recent" and may get new articles
+RECENT_DAYS = 3
+
+
+class NewsCache:
+    """
+    Persistent SQLite cache of news lookups keyed by (provider, query, date).
+
+    Results fetched at least `recent_days` after their date never expire.
+    Results fetched earlier expire after `ttl` seconds, since new articles
+    could still be published when they were looked up. Empty results are cached too, so dates without news
+    are not re-queried. `hits` and `misses` count lookups for reporting.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, recent_days=RECENT_DAYS):
+        self.path = path
+        self.ttl = ttl
+        self.recent_days = recent_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS news ("
+            " provider TEXT, query TEXT, date TEXT, articles TEXT, fetched_at REAL,"
+            " PRIMARY KEY (provider, query, date))"
+        )
+        self._conn.commit()
+
+    def _expired(self, date, fetched_at):
+        # Final only if fetched once the date had stopped being recent; a lookup
+        # made while it was recent (often partial or empty) keeps the TTL
+        try:
+            day = datetime.date.fromisoformat(date)
+        except ValueError:
+            return time.time() - fetched_at > self.ttl
+        settled = datetime.datetime.combine(day + datetime.timedelta(days=self.recent_days), datetime.time.min)
+        if fetched_at >= settled.timestamp():
+            return False
+        return time.time() - fetched_at > self.ttl
+
+    def get(self, provider, query, date):
+        """Return the cached article list (possibly empty), or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT articles, fetched_at FROM news WHERE provider=? AND query=? AND date=?",
+                (provider, query, date),
+            ).fetchone()
+            if row is None or self._expired(date, row[1]):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, provider, query, date, articles):
+        """Store the articles for a lookup; pass [] to cache a negative result."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO news VALUES (?, ?, ?, ?, ?)",
+                (provider, query, date, json.dumps(articles), time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._conn.close()
@@ -1,13 +1,17 @@
 import os
-import requests
-from dotenv import load_dotenv
 
-load_dotenv()
+
+def _api_key():
+    # Read .env on first use rather than as a side effect of importing this module
+    from dotenv import load_dotenv
+    load_dotenv()
+    return os.getenv("NEWSDATA_API_KEY")
+
 
 def get_newsdata_news(ticker, date):
     base_url = "https://newsdata.io/api/1/news"
     params = {
-        "apikey": os.getenv("NEWSDATA_API_KEY"),
+        "apikey": _api_key(),
         "q": ticker,
         "language": "en",
         "from_date": date,
@@ -16,6 +20,8 @@ def get_newsdata_news(ticker, date):
         "country": "us"
     }
 
+    # Imported here so importing this module stays cheap
+    import requests
     response = requests.get(base_url, params=params)
     
     if response.status_code != 200:
@@ -0,0 +1,77 @@
+import datetime
+
+# Dates at most this many days apart are merged into one range request
+MAX_GAP_DAYS = 7
+# Upper bound on the length of a single range request, in days
+MAX_SPAN_DAYS = 31
+# Headlines kept per date, matching the per-day fetchers
+ARTICLES_PER_DATE = 3
+
+
+def plan_ranges(dates, max_gap_days=MAX_GAP_DAYS, max_span_days=MAX_SPAN_DAYS):
+    """
+    Merge anomaly dates into a few contiguous range requests.
+
+    Args:
+        dates: Iterable of 'YYYY-MM-DD' strings.
+        max_gap_days: Largest gap between neighbouring dates inside one range.
+        max_span_days: Largest distance between the first and last date of a range.
+    Returns:
+        List of (start, end, dates) tuples, where start/end are 'YYYY-MM-DD'
+        strings and dates are the requested dates the range covers.
+    """
+    days = sorted({datetime.date.fromisoformat(d) for d in dates})
+    ranges = []
+    for day in days:
+        if ranges:
+            start, last, members = ranges[-1]
+            if (day - last).days <= max_gap_days and (day - start).days <= max_span_days:
+                ranges[-1] = (start, day, members + [day])
+                continue
+        ranges.append((day, day, [day]))
+    return [(s.isoformat(), e.isoformat(), [d.isoformat() for d in m]) for s, e, m in ranges]
+
+
+def bucket_by_date(articles, field="published_at", per_date=ARTICLES_PER_DATE):
+    """
+    Split a ranged result back into {'YYYY-MM-DD': [articles]}, keeping the
+    first `per_date` articles of each day in the order the provider returned them.
+    """
+    buckets = {}
+    for article in articles:
+        stamp = article.get(field) or ""
+        day = stamp[:10]
+        if len(day) == 10 and len(buckets.setdefault(day, [])) < per_date:
+            buckets[day].append(article)
+    return buckets
+
+
+def fetch_range_members(start, end, members, fetch_range, fetch_day=None):
+    """
+    Fetch one planned range (see plan_ranges) and resolve every member date.
+
+    Args:
+        start, end: The range's first and last 'YYYY-MM-DD' dates.
+        members: Requested dates inside the range.
+        fetch_range: Callable (start, end) -> (articles, complete) that pages
+            through the range; `complete` is False if paging stopped early.
+            It returns (None, False) if the request failed.
+        fetch_day: Optional callable (date) -> articles used for dates a
+            truncated range did not reach.
+    Returns:
+        Dict of date -> article list ([] when the provider has no news for
+        that date), or None for dates that could not be fetched.
+    """
+    articles, complete = fetch_range(start, end)
+    buckets = bucket_by_date(articles or [])
+    news = {}
+    for date in members:
+        if date in buckets:
+            news[date] = buckets[date]
+        elif articles is not None and complete:
+            news[date] = []
+        elif fetch_day is not None:
+            news[date] = fetch_day(date)
+        else:
+            news[date] = None
+    return news
@@ -1,7 +1,41 @@
-import requests
+from scripts.http_client import TokenBucket, get_with_retry, make_session
 
-def get_newsapi_news(query, date, api_key):
-    url = "https://api.thenewsapi.com/v1/news/all"
+PROVIDER = "thenewsapi"
+NEWSAPI_URL = "https://api.thenewsapi.com/v1/news/all"
+# Concurrency and sustained request rate used by fetch_news_for_anomalies
+MAX_WORKERS = 8
+RATE_PER_SECOND = 5
+# Page size and page cap for ranged queries
+PAGE_LIMIT = 50
+MAX_PAGES = 5
+
+_session = None
+_limiter = None
+
+
+def get_session():
+    """Shared, pooled session so repeated calls reuse TLS connections."""
+    global _session
+    if _session is None:
+        _session = make_session(pool_size=MAX_WORKERS)
+    return _session
+
+
+def get_limiter():
+    """Shared token bucket across every thread talking to the provider."""
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucket(rate=RATE_PER_SECOND, burst=MAX_WORKERS)
+    return _limiter
+
+
+def get_newsapi_news(query, date, api_key, session=None, base_url=NEWSAPI_URL, limiter=None):
+    """
+    Fetch up to 3 headlines for `query` published on `date`.
+
+    Returns a list of articles (empty if none matched), or None if the
+    request failed, so callers can tell "no news" apart from an error.
+    """
     params = {
         "api_token": api_key,
         "search": query,
@@ -11,18 +45,64 @@ def get_newsapi_news(query, date, api_key):
         "limit": 5
     }
 
-    response = requests.get(url, params=params)
+    response = get_with_retry(session or get_session(), base_url, params=params, limiter=limiter)
+    if response is None:
+        print(f"❌ Error: no response for {query} on {date}")
+        return None
     if response.status_code != 200:
         print(f"❌ Error {response.status_code}: {response.text}")
-        return []
+        return None
 
     articles = response.json().get("data", [])
-    return [
-        {
-            "title": a["title"],
-            "url": a["url"],
-            "source": a["source"],
-            "published_at": a["published_at"]
+    return [_to_article(a) for a in articles[:3]]
+
+
+def get_newsapi_news_range(query, start, end, api_key, session=None, base_url=NEWSAPI_URL,
+                           limiter=None, page_limit=PAGE_LIMIT, max_pages=MAX_PAGES):
+    """
+    Fetch every article for `query` published between `start` and `end`
+    (inclusive 'YYYY-MM-DD' dates), paging through up to `max_pages` pages.
+
+    Returns:
+        (articles, complete): `complete` is False if paging stopped at
+        `max_pages` before the provider ran out of results. Returns
+        (None, False) if a request failed.
+    """
+    articles = []
+    for page in range(1, max_pages + 1):
+        params = {
+            "api_token": api_key,
+            "search": query,
+            "language": "en",
+            "published_after": f"{start}T00:00:00",
+            "published_before": f"{end}T23:59:59",
+            "categories": "business,finance",
+            "limit": page_limit,
+            "page": page,
         }
-        for a in articles[:3]
-    ]
+        response = get_with_retry(session or get_session(), base_url, params=params, limiter=limiter)
+        if response is None or response.status_code != 200:
+            detail = f"{response.status_code}: {response.text}" if response is not None else "no response"
+            print(f"❌ Error {detail}")
+            return None, False
+
+        payload = response.json()
+        data = payload.get("data", [])
+        articles += [_to_article(a) for a in data]
+        # The plan may cap the page size below `page_limit` (3 on the free plan),
+        # so page by what the server says it returned
+        meta = payload.get("meta", {})
+        per_page = meta.get("limit") or meta.get("returned") or len(data)
+        found = meta.get("found")
+        if not data or len(data) < per_page or (found is not None and len(articles) >= found):
+            return articles, True
+    return articles, False
+
+
+def _to_article(a):
+    return {
+        "title": a["title"],
+        "url": a["url"],
+        "source": a["source"],
+        "published_at": a["published_at"]
+    }
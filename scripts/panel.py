@@ -0,0 +1,215 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.analyzer import DEFAULT_MIN_GAP_DAYS, PROMPT_DEFAULTS, ROLLING_LOOKBACK, select_min_gap
+from scripts.batch import read_universe
+from scripts.price_io import DATA_DIR, load_price_history
+from scripts.rolling_stats import sorted_median, rolling_median_mad_2d
+
+# Tickers processed together; bounds the (dates x tickers x window) scratch arrays
+PANEL_CHUNK = 256
+PANEL_COLUMNS = ["Ticker", "Kind", "Date", "EndDate", "Value", "ModifiedZ"]
+PANEL_SUMMARY = "data/panel_anomalies.csv"
+
+
+def load_panel(tickers, data_dir=DATA_DIR):
+    """
+    Build a wide (dates x tickers) close-price matrix from stored histories.
+
+    Dates are the union of every ticker's bars; a ticker has NaN on dates it
+    did not trade. Tickers without a stored history are skipped.
+    """
+    closes = {}
+    for ticker in tickers:
+        try:
+            df = load_price_history(ticker, data_dir)
+        except FileNotFoundError:
+            df = None
+        if df is None or df.empty:
+            print(f"⚠️ No stored history for {ticker}, skipping")
+            continue
+        closes[ticker] = df["Close"]
+    return pd.DataFrame(closes).sort_index()
+
+
+def column_modified_z(x: np.ndarray) -> np.ndarray:
+    """
+    modified_z_score() down every column of a NaN-padded 2D array.
+
+    Each column is scored against its own valid values; a column whose MAD
+    is zero scores 0, as in the 1D version.
+    """
+    valid = ~np.isnan(x)
+    counts = valid.sum(axis=0)
+    median = sorted_median(np.sort(x, axis=0).T, counts)
+    mad = sorted_median(np.sort(np.abs(x - median), axis=0).T, counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = 0.6745 * (x - median) / mad
+    return np.where((mad == 0) & valid, 0.0, z)
+
+
+def _pack_columns(values):
+    # Move each column's valid values to the top, in time order, so every
+    # column becomes its own gap-free series with NaN padding at the bottom.
+    order = np.argsort(np.isnan(values), axis=0, kind="stable")
+    packed = np.take_along_axis(values, order, axis=0)
+    return packed, order, np.count_nonzero(~np.isnan(values), axis=0)
+
+
+def _min_gap_per_column(cols, seconds, gap_seconds):
+    # Greedy min-gap selection for many columns in one call: events are
+    # sorted by (column, time) and each column is shifted far enough past the
+    # previous one that its first event is always kept.
+    if len(cols) == 0:
+        return np.arange(0)
+    stride = int(seconds.max() - seconds.min()) + gap_seconds + 1
+    return select_min_gap(cols.astype(np.int64) * stride + (seconds - seconds.min()), gap_seconds)
+
+
+def _panel_runs(packed, lengths, min_days):
+    # directional_runs() for every column at once, on the column-major flattening
+    n, cols = packed.shape
+    if n < 2:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, empty, np.zeros(0)
+    growth = packed[1:] / packed[:-1]
+    sign = np.sign(growth - 1)
+    sign[np.isnan(sign)] = 0
+    growth[np.isnan(growth)] = 1.0          # padding does not change run products
+
+    flat_sign = sign.T.ravel()
+    flat_growth = growth.T.ravel()
+    nonzero = np.flatnonzero(flat_sign)
+    col_of = nonzero // (n - 1)
+    new_run = np.ones(len(nonzero), dtype=bool)
+    new_run[1:] = (col_of[1:] != col_of[:-1]) | (flat_sign[nonzero[1:]] != flat_sign[nonzero[:-1]])
+    first = nonzero[new_run]
+    run_col = col_of[new_run]
+    if len(first) == 0:
+        return run_col, first, first, np.zeros(0)
+
+    start = first - run_col * (n - 1)
+    same_col_next = np.append(run_col[1:] == run_col[:-1], False)
+    end = np.where(same_col_next, np.append(start[1:], 0), lengths[run_col] - 1)
+    cumulative = np.multiply.reduceat(flat_growth, first) - 1
+
+    keep = end - start + 1 >= min_days
+    return run_col[keep], start[keep], end[keep], cumulative[keep]
+
+
+def _screen_chunk(tickers, dates, values, config, lookback, min_gap_days):
+    packed, order, lengths = _pack_columns(values)
+    n, cols = packed.shape
+    seconds = (dates.values.astype("datetime64[ns]").view(np.int64) // 10**9)
+    found = []
+
+    def emit(kind, rows, cols_, value, z, end_rows=None):
+        date_rows = order[rows, cols_]
+        found.append(pd.DataFrame({
+            "Ticker": tickers[cols_],
+            "Kind": kind,
+            "Date": dates[date_rows],
+            "EndDate": dates[order[end_rows, cols_]] if end_rows is not None else pd.NaT,
+            "Value": value,
+            "ModifiedZ": z,
+        }))
+
+    # 1-day returns, scored against each ticker's whole history
+    returns = packed[1:] / packed[:-1] - 1
+    z = column_modified_z(returns)
+    rows, cols_ = np.nonzero(np.abs(z) > config["mad_threshold"])
+    emit("mad", rows + 1, cols_, returns[rows, cols_], z[rows, cols_])
+
+    # k-day compounded returns: rolling-trend (trailing MAD) and extreme (whole history)
+    for kind, window, gap_days in (
+        ("rolling", config["rolling_window"], config["rolling_window"]),
+        ("extreme", config["extreme_window"], min_gap_days),
+    ):
+        compound = packed[window:] / packed[:-window] - 1
+        if kind == "rolling":
+            median, mad = rolling_median_mad_2d(compound, lookback)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                z = 0.6745 * (compound - median) / np.where(mad == 0, np.nan, mad)
+        else:
+            z = column_modified_z(compound)
+        # Column-major order so events are sorted by (ticker, date)
+        cols_, rows = np.nonzero((np.abs(z) > config[f"{kind}_threshold"]).T)
+        bar_rows = rows + window
+        kept = _min_gap_per_column(cols_, seconds[order[bar_rows, cols_]], gap_days * 86400)
+        rows, cols_ = rows[kept], cols_[kept]
+        emit(kind, rows + window, cols_, compound[rows, cols_], z[rows, cols_])
+
+    # Persistent runs, scored against each ticker's own qualifying runs
+    run_col, start, end, cumulative = _panel_runs(packed, lengths, config["persistent_min_days"])
+    if len(run_col):
+        slot = np.arange(len(run_col)) - np.searchsorted(run_col, run_col)
+        padded = np.full((slot.max() + 1, cols), np.nan)
+        padded[slot, run_col] = cumulative
+        z = column_modified_z(padded)[slot, run_col]
+        flagged = np.abs(z) > config["persistent_threshold"]
+        emit("persistent", start[flagged], run_col[flagged], cumulative[flagged], z[flagged],
+             end_rows=end[flagged])
+
+    return found
+
+
+def screen_panel(closes, config=None, lookback=ROLLING_LOOKBACK,
+                 min_gap_days=DEFAULT_MIN_GAP_DAYS, chunk_size=PANEL_CHUNK):
+    """
+    Run every detector over a whole (dates x tickers) panel in column chunks.
+
+    Each ticker gets the same results as detect_all_anomalies() on its own
+    history. Dates a ticker did not trade (NaN) are skipped, not treated as
+    zero returns. Returns, compounded returns, rolling MAD and Z-scores are
+    computed for a whole chunk of tickers at once along axis 0.
+
+    Args:
+        closes: DataFrame of close prices, one column per ticker, DateTime index.
+        config: Detection config (see detect_all_anomalies); PROMPT_DEFAULTS if None.
+        chunk_size: Tickers per chunk; bounds peak memory on wide panels.
+    Returns:
+        Long DataFrame with ['Ticker', 'Kind', 'Date', 'EndDate', 'Value', 'ModifiedZ'],
+        one row per anomaly. Kind is 'mad', 'rolling', 'extreme' or 'persistent'.
+        EndDate is only set for persistent runs (Date is the run start).
+    """
+    config = config or PROMPT_DEFAULTS
+    dates = pd.DatetimeIndex(closes.index)
+    tickers = np.asarray(closes.columns, dtype=object)
+    values = closes.to_numpy(dtype=float)
+
+    found = []
+    for start in range(0, values.shape[1], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        found.extend(_screen_chunk(tickers[chunk], dates, values[:, chunk], config, lookback, min_gap_days))
+
+    found = [f for f in found if not f.empty]
+    if not found:
+        return pd.DataFrame(columns=PANEL_COLUMNS)
+    table = pd.concat(found, ignore_index=True)
+    return table.sort_values(["Ticker", "Kind", "Date"], kind="stable", ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a whole ticker universe in one vectorized pass.")
+    parser.add_argument("universe", help="Text file with one or more tickers per line")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory with stored price histories")
+    parser.add_argument("--out", default=PANEL_SUMMARY, help="Long-format anomaly table to write")
+    parser.add_argument("--chunk-size", type=int, default=PANEL_CHUNK)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    closes = load_panel(read_universe(args.universe), args.data_dir)
+    table = screen_panel(closes, chunk_size=args.chunk_size)
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    table.to_csv(args.out, index=False)
+    print(f"✅ Screened {closes.shape[1]} tickers x {closes.shape[0]} dates in "
+          f"{time.perf_counter() - t0:.2f}s: {len(table)} anomalies -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.metrics import span
+
+DATA_DIR = "data"
+# Superseded versions of a history are deleted once they are this old (seconds),
+# so a reader that picked one just before a write can still load it
+KEEP_SECONDS = 60
+
+
+def history_path(ticker, data_dir=DATA_DIR, interval="1d"):
+    """Columnar history location for `ticker` (a directory); intraday bars get their own."""
+    if interval == "1d":
+        return os.path.join(data_dir, f"{ticker}_history")
+    return os.path.join(data_dir, f"{ticker}_{interval}_history")
+
+
+def write_json(path, obj):
+    """Write JSON through a temporary file and an atomic rename, so readers never see a partial file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        return json.load(f)
+
+
+def _prune(path, keep):
+    # Drop superseded versions and the arrays of the older unversioned layout.
+    # Files still memory-mapped can't be deleted on Windows; they go on a later save.
+    cutoff = time.time() - KEEP_SECONDS
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        if name in keep:
+            continue
+        if name.startswith("v") and os.path.isdir(full) and os.path.getmtime(full) < cutoff:
+            shutil.rmtree(full, ignore_errors=True)
+        elif name in ("index.npy", "values.npy"):
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def save_prices(df, path):
+    """
+    Write a price history in the columnar format.
+
+    Layout under `path`:
+        v<stamp>/index.npy   int64 nanoseconds since the epoch (UTC)
+        v<stamp>/values.npy  float64 matrix, one row per column, one column per bar
+        meta.json            current version, column names and the index timezone
+
+    Every save writes a new version directory and then swaps meta.json in
+    atomically, so a reader always gets an index, values and columns that
+    belong together, and files another reader has memory-mapped are never
+    overwritten. Storing the values column-major lets `load_prices` hand
+    pandas a memory-mapped block without copying.
+    """
+    os.makedirs(path, exist_ok=True)
+    numeric = df.select_dtypes(include="number")
+    index = pd.DatetimeIndex(df.index)
+    tz = str(index.tz) if index.tz is not None else None
+    utc = index.tz_convert("UTC") if tz else index
+
+    version = f"v{time.time_ns()}_{os.getpid()}_{threading.get_ident()}"
+    os.makedirs(os.path.join(path, version))
+    np.save(os.path.join(path, version, "index.npy"), utc.asi8.astype(np.int64))
+    np.save(os.path.join(path, version, "values.npy"),
+            np.ascontiguousarray(numeric.to_numpy(dtype=np.float64).T))
+
+    try:
+        previous = _read_meta(path).get("version")
+    except (OSError, ValueError):
+        previous = None
+    write_json(os.path.join(path, "meta.json"), {
+        "version": version, "columns": list(numeric.columns), "tz": tz, "index_name": df.index.name,
+    })
+    _prune(path, keep={version, previous})
+
+
+def load_prices(path, mmap=True):
+    """
+    Load a columnar price history written by `save_prices`.
+
+    With `mmap=True` the values are memory-mapped read-only and wrapped by
+    the returned DataFrame without a copy.
+    """
+    mode = "r" if mmap else None
+    for attempt in range(3):
+        meta = _read_meta(path)
+        # Histories written before versioning keep their arrays next to meta.json
+        directory = os.path.join(path, meta["version"]) if meta.get("version") else path
+        try:
+            stamps = np.load(os.path.join(directory, "index.npy"), mmap_mode=mode)
+            values = np.load(os.path.join(directory, "values.npy"), mmap_mode=mode)
+            break
+        except FileNotFoundError:
+            # Pruned after we read meta.json; it now names a newer version
+            if attempt == 2:
+                raise
+
+    index = pd.DatetimeIndex(stamps.view("datetime64[ns]"), name=meta.get("index_name") or "Date")
+    if meta["tz"]:
+        index = index.tz_localize("UTC").tz_convert(meta["tz"])
+    return pd.DataFrame(values.T, index=index, columns=meta["columns"], copy=False)
+
+
+def read_price_csv(path):
+    """
+    Parse a yfinance history CSV into a UTC DatetimeIndex and float columns.
+
+    Used for legacy CSVs; mixed DST offsets are normalised to UTC.
+    """
+    with span("load", path=os.path.basename(path), format="csv"):
+        df = pd.read_csv(path, index_col="Date")
+        df.index = pd.to_datetime(df.index, utc=True)
+    return df
+
+
+def load_price_history(ticker, data_dir=DATA_DIR, interval="1d"):
+    """
+    Shared loader for the analyzer and visualizer.
+
+    Reads the columnar history if present; otherwise parses the legacy
+    `{ticker}_history.csv` once and migrates it so later runs skip parsing.
+    """
+    path = history_path(ticker, data_dir, interval)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        with span("load", ticker=ticker, format="columnar"):
+            return load_prices(path)
+    csv_path = f"{path}.csv"
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"No {interval} price history for {ticker} in {data_dir}")
+    df = read_price_csv(csv_path)
+    save_prices(df, path)
+    return df
+
+
+def migrate_csvs(data_dir=DATA_DIR, remove=False):
+    """
+    Convert every `{ticker}_history.csv` in `data_dir` to the columnar format.
+
+    Returns the list of converted tickers.
+    """
+    converted = []
+    for name in sorted(os.listdir(data_dir)):
+        if not name.endswith("_history.csv"):
+            continue
+        ticker = name[:-len("_history.csv")]
+        csv_path = os.path.join(data_dir, name)
+        save_prices(read_price_csv(csv_path), history_path(ticker, data_dir))
+        if remove:
+            os.remove(csv_path)
+        converted.append(ticker)
+        print(f"✅ Migrated {csv_path} -> {history_path(ticker, data_dir)}")
+    return converted
+
+
+if __name__ == "__main__":
+    # python -m scripts.price_io [data_dir] [--remove-csv]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    migrate_csvs(args[0] if args else DATA_DIR, remove="--remove-csv" in sys.argv)
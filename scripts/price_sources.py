@@ -0,0 +1,126 @@
+import os
+
+import pandas as pd
+
+
+class YFinanceSource:
+    """
+    Price source backed by yfinance.
+
+    Every source exposes `history(ticker, interval, start, end)` returning an
+    OHLCV DataFrame with a tz-aware DatetimeIndex named 'Date'. `start=None`
+    means "from the first available bar", `end=None` means "up to now", and
+    `end` is exclusive.
+
+    Sources may also expose `history_many(tickers, interval, start, end)`
+    returning {ticker: DataFrame} for the tickers that had data; tickers
+    left out are treated as failed. HistoryStore.get_many() falls back to
+    calling `history()` per ticker for sources without it.
+    """
+
+    def __init__(self, threads=True):
+        self.threads = threads
+
+    def history(self, ticker, interval="1d", start=None, end=None):
+        # Imported on first use: yfinance is slow to import and offline paths never need it
+        import yfinance as yf
+        stock = yf.Ticker(ticker)
+        if start is None and end is None:
+            return stock.history(period="max", interval=interval)
+        return stock.history(start=start, end=end, interval=interval)
+
+    def history_many(self, tickers, interval="1d", start=None, end=None):
+        """
+        Download several tickers in one yf.download call and split the result.
+
+        yf.download aligns every ticker to the batch's most common time zone.
+        Daily bars of a ticker from another zone then no longer fall on
+        midnight, so those tickers are fetched again through history() to
+        keep their own exchange calendar. Zones with the same UTC offset
+        (e.g. Toronto in a New York batch) keep the batch's zone, which does
+        not change any bar's date.
+        """
+        import yfinance as yf
+        tickers = list(tickers)
+        range_args = {"period": "max"} if start is None and end is None else {"start": start, "end": end}
+        # Same columns and adjustment as Ticker.history(): adjusted OHLC plus dividends and splits
+        data = yf.download(tickers, interval=interval, group_by="ticker", actions=True, auto_adjust=True,
+                           ignore_tz=False, threads=self.threads, progress=False, **range_args)
+        frames = split_download(data, tickers)
+        if interval[-1] not in ("m", "h"):
+            for ticker, df in frames.items():
+                if (df.index != df.index.normalize()).any():
+                    frames[ticker] = self.history(ticker, interval, start, end)
+        return frames
+
+
+class LocalCSVSource:
+    """
+    Offline stand-in for YFinanceSource that serves `{ticker}_history.csv`
+    files from a directory, sliced to the requested range.
+
+    Records every call in `calls` (and every history_many() batch in
+    `batches`) so callers can check which ranges were actually requested.
+    """
+
+    def __init__(self, directory="data"):
+        self.directory = directory
+        self.calls = []
+        self.batches = []
+
+    def history(self, ticker, interval="1d", start=None, end=None):
+        self.calls.append((ticker, interval, start, end))
+        path = os.path.join(self.directory, f"{ticker}_history.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        df = pd.read_csv(path, index_col="Date")
+        df.index = pd.to_datetime(df.index, utc=True)
+        if start is not None:
+            df = df[df.index >= _as_utc(start)]
+        if end is not None:
+            df = df[df.index < _as_utc(end)]
+        return df
+
+    def history_many(self, tickers, interval="1d", start=None, end=None):
+        self.batches.append((tuple(tickers), interval, start, end))
+        frames = {ticker: self.history(ticker, interval, start, end) for ticker in tickers}
+        return {ticker: df for ticker, df in frames.items() if not df.empty}
+
+
+def split_download(data, tickers):
+    """
+    Split a yf.download(group_by='ticker') frame into one DataFrame per ticker.
+
+    The download reindexes every ticker onto the union of all their bars;
+    those padding rows are dropped again. Tickers without any bars (failed
+    or unknown symbols) are left out.
+
+    Returns:
+        {ticker: DataFrame} keyed by the symbols as passed in `tickers`.
+    """
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    if not isinstance(data.columns, pd.MultiIndex):
+        data = pd.concat({tickers[0].upper(): data}, axis=1)
+    downloaded = set(data.columns.get_level_values(0))
+    for ticker in tickers:
+        # yf.download upper-cases symbols
+        key = ticker if ticker in downloaded else ticker.upper()
+        if key not in downloaded:
+            continue
+        df = data[key].dropna(how="all")
+        if df.empty:
+            continue
+        df.columns.name = None
+        df.index.name = "Date"
+        # The padding turned Volume into floats; history() returns integers
+        if "Volume" in df and not df["Volume"].isna().any():
+            df = df.astype({"Volume": "int64"})
+        frames[ticker] = df
+    return frames
+
+
+def _as_utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
@@ -0,0 +1,140 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Upper bound on the number of elements materialised per batch of windows.
+# Keeps memory flat on multi-million-bar series while still letting NumPy
+# process thousands of windows per call.
+BATCH_ELEMENTS = 1 << 20
+
+
+def _window_batches(x: np.ndarray, window: int):
+    """
+    Yield (start, windows) pairs covering every full window of `x`.
+
+    `windows` is a 2D strided view of shape (rows, window) whose first row
+    ends at position `start + window - 1` of `x`.
+    """
+    views = sliding_window_view(x, window)
+    rows = max(1, BATCH_ELEMENTS // window)
+    for start in range(0, len(views), rows):
+        yield start, views[start:start + rows]
+
+
+def _rolling(x, window, min_periods, with_mad):
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    median = np.full(n, np.nan)
+    mad = np.full(n, np.nan) if with_mad else None
+    if n == 0 or window < 1:
+        return median, mad
+
+    # Partial windows at the head of the series (at most window - 1 of them)
+    for i in range(max(min_periods, 1) - 1, min(window - 1, n)):
+        w = x[:i + 1]
+        median[i] = np.median(w)
+        if with_mad:
+            mad[i] = np.median(np.abs(w - median[i]))
+
+    # Full windows, processed in bounded batches of strided views
+    if n >= window and window >= min_periods:
+        for start, windows in _window_batches(x, window):
+            m = np.median(windows, axis=1)
+            out = slice(start + window - 1, start + window - 1 + len(windows))
+            median[out] = m
+            if with_mad:
+                mad[out] = np.median(np.abs(windows - m[:, None]), axis=1)
+
+    return median, mad
+
+
+def rolling_median_mad(x: np.ndarray, window: int, min_periods: int = 1):
+    """
+    Compute the trailing rolling median and median absolute deviation.
+
+    Matches `Series.rolling(window, min_periods).median()` and
+    `.apply(lambda w: np.median(np.abs(w - np.median(w))), raw=True)`
+    value for value, without calling back into Python per row.
+
+    Args:
+        x: 1D array of numeric values without NaNs.
+        window: Number of trailing observations in each window.
+        min_periods: Minimum observations required to produce a value.
+    Returns:
+        Tuple of (median, mad) arrays, the same length as `x`, with NaN
+        where fewer than `min_periods` observations are available.
+    """
+    return _rolling(x, window, min_periods, with_mad=True)
+
+
+def rolling_median(x: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """
+    Compute the trailing rolling median of `x`.
+
+    Returns:
+        Array the same length as `x`, NaN where fewer than `min_periods`
+        observations are available.
+    """
+    return _rolling(x, window, min_periods, with_mad=False)[0]
+
+
+def rolling_mad(x: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """
+    Compute the trailing rolling median absolute deviation of `x`.
+
+    Returns:
+        Array the same length as `x`, NaN where fewer than `min_periods`
+        observations are available.
+    """
+    return rolling_median_mad(x, window, min_periods)[1]
+
+
+def sorted_median(s: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Median along the last axis of sorted rows whose NaNs sit at the end.
+
+    `counts` gives the number of valid values in each row; rows without any
+    get NaN. Matches np.median on the valid values.
+    """
+    if s.shape[-1] == 0:
+        return np.full(s.shape[:-1], np.nan)
+    lo = np.take_along_axis(s, np.maximum(counts - 1, 0)[..., None] // 2, axis=-1)[..., 0]
+    hi = np.take_along_axis(s, (counts // 2)[..., None], axis=-1)[..., 0]
+    return np.where(counts > 0, (lo + hi) / 2, np.nan)
+
+
+def rolling_median_mad_2d(x: np.ndarray, window: int):
+    """
+    Trailing rolling median and MAD down every column of a 2D array at once.
+
+    NaNs are skipped, so each window uses only its valid values (like
+    `min_periods=1`). On columns without NaNs this gives the same values as
+    rolling_median_mad() on each column. Windows are sorted in row
+    batches of at most BATCH_ELEMENTS values, which keeps memory bounded
+    for wide panels.
+
+    Args:
+        x: 2D array of shape (rows, columns).
+        window: Number of trailing rows in each window.
+    Returns:
+        Tuple of (median, mad) arrays shaped like `x`, NaN where a window
+        has no valid values.
+    """
+    x = np.asarray(x, dtype=float)
+    n, cols = x.shape
+    median = np.full((n, cols), np.nan)
+    mad = np.full((n, cols), np.nan)
+    if n == 0 or cols == 0 or window < 1:
+        return median, mad
+
+    # Pad the head so the first rows see partial windows, like min_periods=1
+    padded = np.vstack([np.full((window - 1, cols), np.nan), x])
+    views = sliding_window_view(padded, window, axis=0)   # (rows, cols, window)
+    rows = max(1, BATCH_ELEMENTS // (window * cols))
+    for start in range(0, n, rows):
+        windows = views[start:start + rows]
+        counts = np.count_nonzero(~np.isnan(windows), axis=-1)
+        m = sorted_median(np.sort(windows, axis=-1), counts)
+        median[start:start + rows] = m
+        mad[start:start + rows] = sorted_median(np.sort(np.abs(windows - m[..., None]), axis=-1), counts)
+
+    return median, mad
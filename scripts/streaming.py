@@ -0,0 +1,214 @@
+import argparse
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from scripts.analyzer import DEFAULT_CONFIG, DEFAULT_GAP_UNIT, PROMPT_DEFAULTS, DEFAULT_MIN_GAP_DAYS, ROLLING_LOOKBACK
+from scripts.price_io import load_prices, read_price_csv
+
+KINDS = ("mad", "rolling", "extreme", "persistent")
+
+
+def _trailing_z(window):
+    """Modified Z-score of the newest value against the trailing window (NaN if MAD is 0)."""
+    w = np.fromiter(window, dtype=float, count=len(window))
+    median = np.median(w)
+    mad = np.median(np.abs(w - median))
+    if mad == 0:
+        return np.nan
+    return 0.6745 * (w[-1] - median) / mad
+
+
+class StreamingDetector:
+    """
+    Incremental version of the detectors in scripts/analyzer.py for live bars.
+
+    State is O(lookback): the last few closes for compounded returns, one
+    trailing window per score, and the current directional run. Each bar
+    is scored against the trailing `lookback` values, including itself.
+    This is exactly how the batch rolling-trend detector works, so replayed
+    trend anomalies match detect_rolling_trend_anomalies(). The 1-day,
+    extreme and run detectors score against the whole history in batch
+    mode. Online they use the same trailing window, which is their causal
+    counterpart. A run is only reported once the direction flips, or on
+    flush().
+
+    Every event is a dict with 'kind' ('mad', 'rolling', 'extreme' or
+    'persistent'), 'date', 'value' and 'z'. Persistent events also carry
+    'start_date' and 'direction'.
+    """
+
+    def __init__(self, config=None, lookback=ROLLING_LOOKBACK, min_gap_days=DEFAULT_MIN_GAP_DAYS):
+        config = config or DEFAULT_CONFIG
+        self.config = config
+        self.lookback = lookback
+        self.rolling_window = config["rolling_window"]
+        self.extreme_window = config["extreme_window"]
+        self.min_days = config["persistent_min_days"]
+        # Gaps between pruned events count bars or wall-clock time, as in apply_thresholds()
+        self.gap_unit = config.get("gap_unit", DEFAULT_GAP_UNIT)
+        if self.gap_unit == "bars":
+            self._gaps = {"rolling": self.rolling_window, "extreme": min_gap_days}
+        else:
+            step = pd.Timedelta(days=1) if self.gap_unit == "days" else pd.Timedelta(self.gap_unit)
+            self._gaps = {"rolling": self.rolling_window * step, "extreme": min_gap_days * step}
+
+        self._closes = deque(maxlen=max(self.rolling_window, self.extreme_window) + 1)
+        self._dates = deque(maxlen=2)
+        self._windows = {kind: deque(maxlen=lookback) for kind in KINDS}
+        self._last_event = {"rolling": None, "extreme": None}
+
+        # Current directional run: sign, start bar, growth product and bar count
+        self._run_sign = 0
+        self._run_start = None
+        self._run_growth = 1.0
+        self._run_bars = 0
+        self.bars = 0
+
+    def update(self, bar):
+        """
+        Feed one bar and return the anomalies it completes (possibly none).
+
+        Args:
+            bar: A row with a 'Close' field and its timestamp as `.name` (as
+                yielded by DataFrame.iterrows()), or a mapping with 'Date'
+                and 'Close' keys.
+        Returns:
+            List of event dicts.
+        """
+        date = pd.Timestamp(bar["Date"] if "Date" in bar else bar.name)
+        close = float(bar["Close"])
+        events = []
+
+        if self._closes:
+            prev_close = self._closes[-1]
+            growth = close / prev_close
+            self._score("mad", date, growth - 1, self.config["mad_threshold"], events)
+            events.extend(self._advance_run(growth))
+
+        self._closes.append(close)
+        self._dates.append(date)
+        self.bars += 1
+
+        for kind, window in (("rolling", self.rolling_window), ("extreme", self.extreme_window)):
+            if len(self._closes) > window:
+                value = close / self._closes[-1 - window] - 1
+                self._score(kind, date, value, self.config[f"{kind}_threshold"], events)
+        return events
+
+    def flush(self):
+        """Report the still-open run as if the stream ended here (like the batch detector)."""
+        events = []
+        if self._run_sign != 0:
+            self._close_run(self._dates[-1], events)
+            self._run_sign = 0
+        return events
+
+    def _score(self, kind, date, value, threshold, events):
+        window = self._windows[kind]
+        window.append(value)
+        z = _trailing_z(window)
+        if not abs(z) > threshold:
+            return
+        if kind in self._last_event:
+            now = self.bars if self.gap_unit == "bars" else date
+            last = self._last_event[kind]
+            if last is not None and now - last < self._gaps[kind]:
+                return
+            self._last_event[kind] = now
+        events.append({"kind": kind, "date": date, "value": value, "z": z})
+
+    def _advance_run(self, growth):
+        # Mirrors directional_runs(): zero returns extend the current run, a
+        # sign flip closes it on the bar before the flipping return.
+        events = []
+        sign = np.sign(growth - 1)
+        if np.isnan(sign):
+            sign = 0
+        if sign != 0 and sign != self._run_sign:
+            if self._run_sign != 0:
+                self._close_run(self._dates[-1], events)
+            self._run_sign = sign
+            self._run_start = self._dates[-1]
+            self._run_growth = 1.0
+            self._run_bars = 1
+        if self._run_sign != 0:
+            self._run_growth *= growth
+            self._run_bars += 1
+        return events
+
+    def _close_run(self, end_date, events):
+        if self._run_bars < self.min_days:
+            return
+        cumulative = self._run_growth - 1
+        window = self._windows["persistent"]
+        window.append(cumulative)
+        z = _trailing_z(window)
+        if abs(z) > self.config["persistent_threshold"]:
+            events.append({
+                "kind": "persistent",
+                "date": end_date,
+                "start_date": self._run_start,
+                "value": cumulative,
+                "z": z,
+                "direction": "up" if cumulative > 0 else "down",
+            })
+
+
+def replay(df, config=None, lookback=ROLLING_LOOKBACK, on_event=None, delay=0.0):
+    """
+    Drive a StreamingDetector bar by bar over a stored price history.
+
+    Args:
+        df: DataFrame with a DateTime index and 'Close' column.
+        config: Detection config (see detect_all_anomalies).
+        on_event: Optional callback invoked with each event as it is emitted.
+        delay: Seconds to sleep between bars, to imitate a live feed.
+    Returns:
+        Dict of event lists keyed by kind, like detect_all_anomalies().
+    """
+    detector = StreamingDetector(config, lookback=lookback)
+    found = {kind: [] for kind in KINDS}
+    for _, bar in df.iterrows():
+        events = detector.update(bar)
+        for event in events:
+            found[event["kind"]].append(event)
+            if on_event:
+                on_event(event)
+        if delay:
+            time.sleep(delay)
+    for event in detector.flush():
+        found[event["kind"]].append(event)
+        if on_event:
+            on_event(event)
+    return found
+
+
+def load_replay_file(path):
+    """Load a `{ticker}_history.csv` file or a columnar `{ticker}_history/` directory."""
+    if os.path.isdir(path):
+        return load_prices(path)
+    return read_price_csv(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a stored price history through the streaming detector.")
+    parser.add_argument("path", help="data/{TICKER}_history.csv or data/{TICKER}_history/")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds between bars")
+    parser.add_argument("--lookback", type=int, default=ROLLING_LOOKBACK)
+    args = parser.parse_args(argv)
+
+    def report(event):
+        print(f"🚨 {event['date']:%Y-%m-%d %H:%M} {event['kind']:<10} "
+              f"value={event['value']:+.2%} z={event['z']:+.2f}")
+
+    # Same thresholds as the batch and panel commands
+    found = replay(load_replay_file(args.path), PROMPT_DEFAULTS, lookback=args.lookback, on_event=report, delay=args.delay)
+    print("✅ Replay done:", {kind: len(events) for kind, events in found.items()})
+
+
+if __name__ == "__main__":
+    main()
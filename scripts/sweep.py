@@ -0,0 +1,231 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from scripts.analyzer import DEFAULT_GAP_UNIT, compute_features, score_detector, threshold_detector
+from scripts.batch import read_universe
+from scripts.price_io import DATA_DIR, load_price_history
+
+SWEEP_THRESHOLDS = (0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0)
+# Window settings swept per detector; 'mad' has no window
+SWEEP_WINDOWS = {
+    "mad": (None,),
+    "rolling": (3, 5, 10),
+    "extreme": (2, 3, 5),
+    "persistent": (4, 7, 10),
+}
+# Forward-return horizons, in bars after the anomaly bar
+FORWARD_HORIZONS = (1, 5, 20)
+SWEEP_SUMMARY = "data/sweep_summary.csv"
+KEYS = ["detector", "window", "threshold"]
+
+
+def _event_bars(index, detector, frame):
+    # Bar position and signed size of each anomaly in a detector's table.
+    # Persistent runs are measured from the bar that ends them.
+    if detector == "mad":
+        stamps, values = frame.index, frame["Return"]
+    elif detector == "rolling":
+        stamps, values = frame.index, frame["RollingReturn"]
+    elif detector == "extreme":
+        # AnomalyDate is the bar's naive local time
+        stamps, values = pd.DatetimeIndex(frame["AnomalyDate"]), frame["RollingReturn"]
+        if index.tz is not None:
+            index = index.tz_localize(None)
+    else:
+        stamps, values = frame["end_date"], frame["cumulative_return"]
+    return index.get_indexer(stamps), np.asarray(values, dtype=float)
+
+
+def _setting_stats(index, close, positions, values, horizons):
+    # Per-ticker sums, so settings can be pooled across tickers afterwards
+    stamps = index.asi8[positions] if len(positions) else np.zeros(0, dtype=np.int64)
+    gaps = np.diff(stamps) / 86_400e9
+    row = {
+        "events": len(positions),
+        "gaps": len(gaps),
+        "gap_days_sum": gaps.sum(),
+        "min_gap_days": gaps.min() if len(gaps) else np.nan,
+    }
+    direction = np.sign(values)
+    for h in horizons:
+        ok = positions + h < len(close)
+        p = positions[ok]
+        forward = close[p + h] / close[p] - 1
+        follow = direction[ok] * forward
+        row[f"fwd{h}_n"] = len(p)
+        row[f"fwd{h}_sum"] = forward.sum()
+        row[f"fwd{h}_follow_sum"] = follow.sum()
+        row[f"fwd{h}_hits"] = int((follow > 0).sum())
+    return row
+
+
+def sweep_ticker(ticker, thresholds=SWEEP_THRESHOLDS, windows=None, horizons=FORWARD_HORIZONS,
+                 gap_unit=DEFAULT_GAP_UNIT, data_dir=DATA_DIR):
+    """
+    Evaluate every (detector, window, threshold) setting on one stored history.
+
+    Each detector is scored once per window and re-thresholded for every
+    threshold. Never raises: failures are reported in the returned dict.
+
+    Returns:
+        Dict with 'ticker', 'status', 'error', 'seconds' and 'rows', one
+        row of pooled statistics per setting (see summarize_sweep).
+    """
+    started = time.perf_counter()
+    windows = windows or SWEEP_WINDOWS
+    result = {"ticker": ticker, "status": "ok", "error": "", "rows": []}
+    try:
+        df = load_price_history(ticker, data_dir)
+        index = pd.DatetimeIndex(df.index)
+        features = compute_features(df)
+        close = features["close"]
+        years = (index[-1] - index[0]).days / 365.25 if len(index) else 0.0
+        for detector, detector_windows in windows.items():
+            for window in detector_windows:
+                scores = score_detector(features, detector, window)
+                for threshold in thresholds:
+                    frame = threshold_detector(features, scores, detector, threshold, gap_unit)
+                    positions, values = _event_bars(index, detector, frame)
+                    row = {"ticker": ticker, "detector": detector, "window": window,
+                           "threshold": threshold, "years": years}
+                    row.update(_setting_stats(index, close, positions, values, horizons))
+                    result["rows"].append(row)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_sweep(tickers, thresholds=SWEEP_THRESHOLDS, windows=None, horizons=FORWARD_HORIZONS,
+              gap_unit=DEFAULT_GAP_UNIT, data_dir=DATA_DIR, workers=None):
+    """
+    Sweep many tickers on a process pool, yielding sweep_ticker() results as they finish.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(sweep_ticker, t, thresholds, windows, horizons, gap_unit, data_dir): t
+            for t in tickers
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:  # worker crashed before it could report
+                yield {"ticker": futures[future], "status": "error",
+                       "error": f"{type(e).__name__}: {e}", "rows": [], "seconds": None}
+
+
+def summarize_sweep(rows, horizons=FORWARD_HORIZONS):
+    """
+    Pool per-ticker rows into one line per (detector, window, threshold).
+
+    Columns:
+        tickers, events, events_per_year (per ticker-year), mean_gap_days and
+        min_gap_days between consecutive anomalies of a ticker, and for each
+        horizon h: fwd{h}_mean (mean forward return), fwd{h}_follow (mean
+        return in the anomaly's direction; negative means reversal) and
+        fwd{h}_hit (share of anomalies followed by a move in their direction).
+    """
+    table = pd.DataFrame(rows)
+    # 'mad' has no window; a sentinel keeps it in the groupby
+    table["window"] = table["window"].fillna(0).astype(int)
+    sums = [c for c in table.columns if c not in KEYS + ["ticker", "min_gap_days"]]
+    grouped = table.groupby(KEYS, sort=True)
+    pooled = grouped[sums].sum()
+    pooled["tickers"] = grouped["ticker"].nunique()
+    pooled["min_gap_days"] = grouped["min_gap_days"].min()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        summary = pd.DataFrame({
+            "tickers": pooled["tickers"],
+            "events": pooled["events"],
+            "events_per_year": pooled["events"] / pooled["years"],
+            "mean_gap_days": pooled["gap_days_sum"] / pooled["gaps"],
+            "min_gap_days": pooled["min_gap_days"],
+        })
+        for h in horizons:
+            n = pooled[f"fwd{h}_n"]
+            summary[f"fwd{h}_mean"] = pooled[f"fwd{h}_sum"] / n
+            summary[f"fwd{h}_follow"] = pooled[f"fwd{h}_follow_sum"] / n
+            summary[f"fwd{h}_hit"] = pooled[f"fwd{h}_hits"] / n
+    return summary.reset_index()
+
+
+def suggest_thresholds(summary, target_per_year):
+    """
+    Lowest threshold per (detector, window) that flags at most `target_per_year`
+    anomalies per ticker-year; None if even the highest threshold flags more.
+    """
+    suggestions = []
+    for (detector, window), group in summary.groupby(["detector", "window"], sort=False):
+        ok = group[group["events_per_year"] <= target_per_year].sort_values("threshold")
+        suggestions.append({
+            "detector": detector,
+            "window": window or None,
+            "threshold": ok["threshold"].iloc[0] if len(ok) else None,
+            "events_per_year": ok["events_per_year"].iloc[0] if len(ok) else None,
+        })
+    return pd.DataFrame(suggestions).astype({"window": "Int64"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep detector thresholds and windows over stored histories.")
+    parser.add_argument("universe", help="File with tickers, one or more per line")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory with stored price histories")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(SWEEP_THRESHOLDS))
+    for detector, key in (("rolling", "rolling-windows"), ("extreme", "extreme-windows"),
+                          ("persistent", "min-days")):
+        parser.add_argument(f"--{key}", type=int, nargs="+", default=list(SWEEP_WINDOWS[detector]))
+    parser.add_argument("--horizons", type=int, nargs="+", default=list(FORWARD_HORIZONS),
+                        help="Forward-return horizons in bars")
+    parser.add_argument("--gap-unit", default=DEFAULT_GAP_UNIT, help="'days', 'bars' or a duration like '1h'")
+    parser.add_argument("--target-per-year", type=float, default=None,
+                        help="Also print the lowest threshold flagging at most this many anomalies per ticker-year")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU cores)")
+    parser.add_argument("--out", default=SWEEP_SUMMARY, help="Summary CSV, one row per setting")
+    args = parser.parse_args(argv)
+
+    windows = {
+        "mad": (None,),
+        "rolling": tuple(args.rolling_windows),
+        "extreme": tuple(args.extreme_windows),
+        "persistent": tuple(args.min_days),
+    }
+    settings = len(args.thresholds) * sum(len(w) for w in windows.values())
+    tickers = read_universe(args.universe)
+    print(f"🚀 Sweeping {settings} settings over {len(tickers)} tickers with "
+          f"{args.workers or os.cpu_count()} workers")
+
+    rows = []
+    failed = 0
+    started = time.perf_counter()
+    for i, result in enumerate(run_sweep(tickers, args.thresholds, windows, args.horizons,
+                                         args.gap_unit, args.data_dir, args.workers), 1):
+        if result["status"] == "ok":
+            rows.extend(result["rows"])
+            print(f"✅ [{i}/{len(tickers)}] {result['ticker']} ({result['seconds']}s)")
+        else:
+            failed += 1
+            print(f"❌ [{i}/{len(tickers)}] {result['ticker']}: {result['error']}")
+
+    if not rows:
+        print("❌ No ticker could be swept")
+        return
+    summary = summarize_sweep(rows, args.horizons)
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    summary.to_csv(args.out, index=False)
+    print(f"✅ Done: {len(tickers) - failed} ok, {failed} failed in {time.perf_counter() - started:.1f}s "
+          f"-> {args.out}")
+    if args.target_per_year is not None:
+        print(f"🎯 Suggested thresholds for <= {args.target_per_year:g} anomalies per ticker-year:")
+        print(suggest_thresholds(summary, args.target_per_year).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+META_PATH = "data/ticker_meta.sqlite"
+# Metadata is refreshed after this many seconds (names and listings rarely change)
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+WARM_WORKERS = 8
+
+
+def yfinance_lookup(ticker):
+    """Look up name, exchange and currency through yfinance's (slow) .info call."""
+    import yfinance as yf
+    info = yf.Ticker(ticker).info
+    return {
+        "name": info.get("longName") or info.get("shortName") or ticker,
+        "exchange": info.get("exchange"),
+        "currency": info.get("currency"),
+    }
+
+
+class TickerMetaCache:
+    """
+    Persistent ticker metadata cache (name, exchange, currency).
+
+    Lookups are memoised in-process and stored in SQLite, so a pipeline run
+    performs at most one `.info` call per ticker and later runs none. Failed
+    lookups fall back to the ticker symbol as the name and are not persisted,
+    so they are retried on the next run.
+    """
+
+    def __init__(self, path=META_PATH, lookup=yfinance_lookup, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.lookup = lookup
+        self.max_age = max_age
+        self._memo = {}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ticker_meta (ticker TEXT PRIMARY KEY, meta TEXT, fetched_at REAL)"
+        )
+        self._conn.commit()
+
+    def _load(self, ticker):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT meta, fetched_at FROM ticker_meta WHERE ticker=?", (ticker,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.max_age:
+            return None
+        return json.loads(row[0])
+
+    def _store(self, ticker, meta):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ticker_meta VALUES (?, ?, ?)",
+                (ticker, json.dumps(meta), time.time()),
+            )
+            self._conn.commit()
+
+    def get(self, ticker):
+        """Return {'name', 'exchange', 'currency'} for `ticker`."""
+        ticker = ticker.upper()
+        if ticker in self._memo:
+            return self._memo[ticker]
+        meta = self._load(ticker)
+        if meta is None:
+            try:
+                meta = self.lookup(ticker)
+                self._store(ticker, meta)
+            except Exception as e:
+                print(f"⚠️ Metadata lookup failed for {ticker}: {e}")
+                meta = {"name": ticker, "exchange": None, "currency": None}
+        self._memo[ticker] = meta
+        return meta
+
+    def warm(self, tickers, max_workers=WARM_WORKERS):
+        """Resolve metadata for many tickers up front, looking up misses concurrently."""
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(zip(tickers, pool.map(self.get, tickers)))
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TickerMetaCache()
+    return _default_cache
+
+
+def get_company_name(ticker):
+    """Company name for news queries, falling back to the ticker symbol."""
+    return default_cache().get(ticker)["name"]
+
+
+if __name__ == "__main__":
+    # python -m scripts.ticker_meta universe.txt  -> warm the cache for a universe
+    from scripts.batch import read_universe
+    resolved = default_cache().warm(read_universe(sys.argv[1]))
+    print(f"✅ Cached metadata for {len(resolved)} tickers in {META_PATH}")
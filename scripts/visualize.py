@@ -1,48 +1,274 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import json
 import os
+import sys
 import webbrowser
 
-def generate_visualization(price_csv, news_json, ticker,
-                           z_anomalies=None, trend_anomalies=None,
-                           run_anomalies=None, extreme_anomalies=None):
-    # Load and normalize data
-    df = pd.read_csv(price_csv)
-    df = df.rename(columns={"Date": "date", "Close": "close"})
-    df["date"] = pd.to_datetime(df["date"], utc=True, errors="coerce")
-    df["return"] = df["close"].pct_change()
-    df["direction"] = df["return"].apply(lambda x: "up" if x > 0 else "down")
+from scripts.bars import is_intraday
+from scripts.downsample import DEFAULT_MAX_POINTS, decimation_levels
+from scripts.metrics import span
+from scripts.price_io import read_price_csv
 
-    # Load news
-    with open(news_json, "r") as f:
-        news_by_date = json.load(f)
-    df["date_str"] = df["date"].dt.strftime("%Y-%m-%d")
-    df["news"] = df["date_str"].map(lambda d: "<br>".join(news_by_date.get(d, [])))
+# Series longer than this are drawn with WebGL (Scattergl) traces
+WEBGL_THRESHOLD = 5000
+# Export modes: "standalone" inlines plotly.js and puts headlines in every marker's
+# hover text; "shared" references one plotly.min.js next to the charts and stores
+# headlines once in a date-keyed JSON block read by the click handler.
+EXPORT_MODES = ("standalone", "shared")
+# Anomalies are matched to bars by UTC date on daily charts and by UTC bar time
+# on intraday charts; headlines are always keyed by date.
+DAY_FORMAT = "%Y-%m-%d"
+BAR_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def anomaly_keys(values, intraday=False, tz=None):
+    """
+    Format anomaly timestamps as the chart's marker keys.
+
+    Args:
+        values: Timestamps (index, Series or list). Naive ones, like the
+            extreme detector's AnomalyDate, are read in `tz`, or UTC if None.
+        intraday: Key by bar time instead of by date.
+        tz: Timezone of the price index the anomalies came from.
+    Returns:
+        List of strings to pass as z_anomalies, trend_anomalies, etc.
+    """
+    stamps = pd.DatetimeIndex(pd.to_datetime(values))
+    if stamps.tz is None:
+        # A wall time repeated by a DST change cannot be placed; its marker is dropped
+        stamps = stamps.tz_localize(tz or "UTC", ambiguous="NaT", nonexistent="shift_forward").dropna()
+    return stamps.tz_convert("UTC").strftime(BAR_FORMAT if intraday else DAY_FORMAT).tolist()
+
+
+def browser_available():
+    """
+    Whether a chart may be opened in a local browser.
+
+    False when ANOMALY_HEADLESS is set, inside a Streamlit server, or on
+    Linux without a display, so server runs never try to launch one.
+    """
+    if os.environ.get("ANOMALY_HEADLESS", "").lower() in ("1", "true", "yes"):
+        return False
+    if "streamlit" in sys.modules:
+        from streamlit import runtime
+        if runtime.exists():
+            return False
+    if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return False
+    return True
+
+
+def _spans_intraday(dates):
+    # Bars closer together than a day, judged by the median spacing
+    if len(dates) < 2:
+        return False
+    return np.median(np.diff(dates.values.astype("datetime64[ns]").view(np.int64))) < 86_400 * 10**9
+
+
+def _colored_polyline(x, y, segment_mask):
+    """
+    Join the selected segments of a line into one NaN-separated polyline.
+
+    Segment i runs from point i - 1 to point i; `segment_mask[i - 1]` selects
+    it. Consecutive selected segments share their joint, and a NaN y-value
+    is inserted after the last point of each run so Plotly breaks the line.
+
+    Returns:
+        (x, y) arrays for a single trace.
+    """
+    n = len(y)
+    include = np.zeros(n, dtype=bool)
+    include[1:] |= segment_mask
+    include[:-1] |= segment_mask
+    # The line continues past point j only if segment j -> j + 1 is selected too
+    continues = np.append(segment_mask, False)
+
+    points = np.flatnonzero(include)
+    breaks = points[~continues[points]]
+    order = np.concatenate([points, breaks])
+    gap = np.concatenate([np.zeros(len(points), bool), np.ones(len(breaks), bool)])
+    sort = np.argsort(order, kind="stable")
+    order, gap = order[sort], gap[sort]
+
+    y_out = np.where(gap, np.nan, np.asarray(y, dtype=float)[order])
+    return np.asarray(x)[order], y_out
+
+
+def _direction_lines(x, close):
+    """Split a (possibly decimated) line into up and down polylines: {'up': (x, y), 'down': (x, y)}."""
+    up = np.diff(close) > 0
+    return {
+        "up": _colored_polyline(x, close, up),
+        "down": _colored_polyline(x, close, ~up),
+    }
+
+
+def _zoom_levels_json(dates, close, levels):
+    """
+    Serialize the finer decimation levels for the zoom handler.
+
+    levels[0] is the drawn line and is not repeated. Each other level stores
+    its points once: x as integer offsets from the first bar in units of the
+    bar spacing, y to 6 significant digits. The handler rebuilds the up/down
+    polylines for the visible range.
+    """
+    ms = dates.dt.tz_localize(None).to_numpy().astype("datetime64[ms]").view(np.int64)
+    offsets = ms - ms[0]
+    step = int(np.gcd.reduce(offsets)) or 1
+    out = {"t0": int(ms[0]), "step": step, "levels": [
+        {"x": (offsets[idx] // step).tolist(),
+         "y": [None if np.isnan(v) else float(f"{v:.6g}") for v in close[idx]]}
+        for idx in levels[1:]
+    ]}
+    return json.dumps(out, separators=(",", ":"))
+
+
+# Swaps in the coarsest decimation level that still gives the visible x-range
+# enough points, so zooming into a long series reveals full detail. The full
+# view restores the figure's own (coarsest) line.
+ZOOM_SCRIPT = '''
+    (function() {
+      var zoom = __LEVELS__, budget = __BUDGET__, levels = zoom.levels;
+      var gd = document.querySelector('.plotly-graph-div');
+      if (!gd || !gd.on || !levels.length) return;
+      var top = [gd.data[0], gd.data[1]].map(function(t) { return {x: t.x, y: t.y}; });
+      var last = levels[0].x[levels[0].x.length - 1];
+      function lowerBound(arr, v) {
+        var lo = 0, hi = arr.length;
+        while (lo < hi) { var mid = (lo + hi) >> 1; if (arr[mid] < v) lo = mid + 1; else hi = mid; }
+        return lo;
+      }
+      function offset(v) {
+        // Axis range (a date string or epoch ms) -> offset in level x units
+        if (typeof v !== 'number') {
+          var p = String(v).split(/[- :T]/);
+          v = Date.UTC(+p[0], (+p[1] || 1) - 1, +p[2] || 1, +p[3] || 0, +p[4] || 0) + 1000 * (parseFloat(p[5]) || 0);
+        }
+        return (v - zoom.t0) / zoom.step;
+      }
+      function lines(level, a, b) {
+        // Up/down polylines over points a..b-1, broken by nulls between runs
+        var up = {x: [], y: [], end: -1}, down = {x: [], y: [], end: -1};
+        for (var i = a + 1; i < b; i++) {
+          var line = level.y[i] > level.y[i - 1] ? up : down, x0 = zoom.t0 + level.x[i - 1] * zoom.step;
+          if (line.end !== i - 1) {
+            if (line.x.length) { line.x.push(x0); line.y.push(null); }
+            line.x.push(x0); line.y.push(level.y[i - 1]);
+          }
+          line.x.push(zoom.t0 + level.x[i] * zoom.step); line.y.push(level.y[i]); line.end = i;
+        }
+        return [up, down];
+      }
+      gd.on('plotly_relayout', function(ev) {
+        var lo = ev['xaxis.range[0]'], hi = ev['xaxis.range[1]'];
+        if (ev['xaxis.autorange'] || lo === undefined || (offset(lo) <= 0 && offset(hi) >= last)) {
+          Plotly.restyle(gd, {x: [top[0].x, top[1].x], y: [top[0].y, top[1].y]}, [0, 1]);
+          return;
+        }
+        lo = offset(lo); hi = offset(hi);
+        for (var k = 0; k < levels.length; k++) {
+          var x = levels[k].x, a = Math.max(lowerBound(x, lo) - 1, 0), b = Math.min(lowerBound(x, hi) + 1, x.length);
+          if (b - a >= budget || k === levels.length - 1) {
+            var l = lines(levels[k], a, b);
+            Plotly.restyle(gd, {x: [l[0].x, l[1].x], y: [l[0].y, l[1].y]}, [0, 1]);
+            return;
+          }
+        }
+      });
+    })();
+    '''
+
+
+def build_figure(price_df, news_by_date, ticker,
+                 z_anomalies=None, trend_anomalies=None,
+                 run_anomalies=None, extreme_anomalies=None,
+                 webgl=None, max_points=DEFAULT_MAX_POINTS, interval=None):
+    """
+    Build the anomaly chart as an in-memory Plotly figure (e.g. for st.plotly_chart).
+
+    Headlines are shown in each marker's hover text. See generate_visualization
+    for the HTML export with the click-to-open news box. `interval` ('1m' ...
+    '1d') picks daily or intraday markers; None infers it from the bar spacing.
+    """
+    with span("figure_build", ticker=ticker):
+        return _build_chart(price_df, news_by_date, ticker, z_anomalies, trend_anomalies,
+                            run_anomalies, extreme_anomalies, webgl, max_points, "standalone", interval)[0]
+
+
+def _build_chart(price_df, news_by_date, ticker, z_anomalies, trend_anomalies,
+                 run_anomalies, extreme_anomalies, webgl, max_points, export_mode, interval=None):
+    # Returns (figure, post_script) for the given export mode
+    df = pd.DataFrame({
+        "date": pd.to_datetime(price_df.index, utc=True),
+        "close": price_df["Close"].to_numpy(),
+    })
+
+    if export_mode not in EXPORT_MODES:
+        raise ValueError(f"export_mode must be one of {EXPORT_MODES}, got {export_mode!r}")
+    shared = export_mode == "shared"
+
+    intraday = _spans_intraday(df["date"]) if interval is None else is_intraday(interval)
+    df["date_str"] = df["date"].dt.strftime(DAY_FORMAT)
+    key = df["date"].dt.strftime(BAR_FORMAT) if intraday else df["date_str"]
 
     # Flag anomalies
-    df["z_dot"] = df["date_str"].isin(z_anomalies or [])
-    df["trend_dot"] = df["date_str"].isin(trend_anomalies or [])
-    df["run_dot"] = df["date_str"].isin(run_anomalies or [])
-    df["extreme_dot"] = df["date_str"].isin(extreme_anomalies or [])
+    df["z_dot"] = key.isin(z_anomalies or [])
+    df["trend_dot"] = key.isin(trend_anomalies or [])
+    df["run_dot"] = key.isin(run_anomalies or [])
+    df["extreme_dot"] = key.isin(extreme_anomalies or [])
+    any_dot = df[["z_dot", "trend_dot", "run_dot", "extreme_dot"]].any(axis=1)
+
+    # Headlines are only needed on anomaly dates
+    if shared:
+        news_block = {d: news_by_date[d] for d in df.loc[any_dot, "date_str"].unique() if d in news_by_date}
+    else:
+        df["news"] = ""
+        df.loc[any_dot, "news"] = df.loc[any_dot, "date_str"].map(
+            lambda d: "<br>".join(news_by_date.get(d, [])))
+
+    # Large series switch to WebGL rendering automatically
+    if webgl is None:
+        webgl = len(df) > WEBGL_THRESHOLD
+    Scatter = go.Scattergl if webgl else go.Scatter
+
+    # Decimate long series to the point budget, never dropping an anomaly date.
+    # Finer levels are embedded for the zoom handler; short series draw every bar.
+    close = df["close"].to_numpy()
+    x_str = df["date"].dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+    levels = None
+    line_idx = np.arange(len(df))
+    if max_points and len(df) > max_points:
+        keep = np.flatnonzero(any_dot)
+        levels = decimation_levels(close, max_points, keep=keep)
+        line_idx = levels[0]
 
-    # Plot line segments colored by direction
+    # Plot line segments colored by direction: one NaN-separated trace per colour
     colors = {"up": "limegreen", "down": "crimson"}
+    lines = _direction_lines(x_str[line_idx], close[line_idx])
     segments = []
-    for i in range(1, len(df)):
-        prev, curr = df.iloc[i - 1], df.iloc[i]
-        segments.append(go.Scatter(
-            x=[prev["date"], curr["date"]],
-            y=[prev["close"], curr["close"]],
+    for direction, color in colors.items():
+        x, y = lines[direction]
+        segments.append(Scatter(
+            x=x, y=y,
             mode="lines",
-            line=dict(color=colors[curr["direction"]], width=2),
+            line=dict(color=color, width=2),
             hoverinfo="skip", showlegend=False
         ))
 
     # Helper for anomaly dots
     def make_dot(col, color, name, icon):
         sel = df[df[col]]
-        return go.Scatter(
+        if shared:
+            # Only the date travels with each marker; headlines live in the news block
+            return Scatter(
+                x=sel["date"], y=sel["close"], mode="markers",
+                marker=dict(size=12, color=color, line=dict(width=1, color="black")),
+                name=name, customdata=sel["date_str"],
+                hovertemplate=f"<b>{icon} {name}</b><br>%{{customdata}} · click for headlines<extra></extra>"
+            )
+        return Scatter(
             x=sel["date"], y=sel["close"], mode="markers",
             marker=dict(size=12, color=color, line=dict(width=1, color="black")),
             name=name, text=sel["news"],
@@ -50,9 +276,10 @@ def generate_visualization(price_csv, news_json, ticker,
         )
 
     # Create dots, revert to goldenrod
+    unit = "Bar" if intraday else "Day"
     dots = [
-        make_dot("z_dot", "goldenrod", "1-Day Spikes", "📌"),
-        make_dot("trend_dot", "dodgerblue", "5-Day Trend", "📈"),
+        make_dot("z_dot", "goldenrod", f"1-{unit} Spikes", "📌"),
+        make_dot("trend_dot", "dodgerblue", f"5-{unit} Trend", "📈"),
         make_dot("run_dot", "mediumorchid", "Run Anomaly", "🔥"),
         make_dot("extreme_dot", "red", "Extreme Anomaly", "⚡")
     ]
@@ -71,13 +298,10 @@ def generate_visualization(price_csv, news_json, ticker,
         )
     )
 
-    # Prepare HTML export
-    os.makedirs("plots", exist_ok=True)
-    output_path = f"plots/{ticker.lower()}_anomaly_chart.html"
-
     # JavaScript to append news box and handle clicks
     post_script = '''
     (function() {
+      var newsByDate = __NEWS__;
       var style = document.createElement('style');
       style.innerHTML = '#news-box a { color: white !important; }';
       document.head.appendChild(style);
@@ -105,21 +329,59 @@ def generate_visualization(price_csv, news_json, ticker,
       var gd = document.querySelector('.plotly-graph-div');
       if (gd && gd.on) {
         gd.on('plotly_click', function(evt) {
-          var txt = evt.points[0].text || '';
+          var p = evt.points[0];
+          var txt = newsByDate ? (newsByDate[p.customdata] || []).join('<br>') : (p.text || '');
           content.innerHTML = txt;
           box.style.display = 'block';
         });
       }
     })();
     '''
+    post_script = post_script.replace(
+        # "<\/" keeps a headline containing "</script>" from closing the script tag
+        "__NEWS__", json.dumps(news_block, separators=(",", ":")).replace("</", "<\\/") if shared else "null")
+    if levels is not None:
+        post_script += ZOOM_SCRIPT.replace("__LEVELS__", _zoom_levels_json(df["date"], close, levels)) \
+                                  .replace("__BUDGET__", str(max_points))
+    return fig, post_script
 
-    # Write HTML with embedded JS, auto-open
-    fig.write_html(
-        output_path,
-        include_plotlyjs=True,
-        full_html=True,
-        auto_open=True,
-        post_script=post_script
-    )
 
-    print(f"✅ Chart saved & opened: {output_path}")
+def generate_visualization(price_csv=None, news_json=None, ticker=None,
+                           z_anomalies=None, trend_anomalies=None,
+                           run_anomalies=None, extreme_anomalies=None,
+                           price_df=None, webgl=None, max_points=DEFAULT_MAX_POINTS,
+                           export_mode="standalone", auto_open=None, interval=None):
+    # Load and normalize data; pass price_df to reuse an already loaded history.
+    # auto_open=None opens the chart only where a browser is available.
+    if auto_open is None:
+        auto_open = browser_available()
+    if price_df is None:
+        price_df = read_price_csv(price_csv)
+
+    # Load news
+    with open(news_json, "r") as f:
+        news_by_date = json.load(f)
+
+    with span("figure_build", ticker=ticker):
+        fig, post_script = _build_chart(price_df, news_by_date, ticker, z_anomalies, trend_anomalies,
+                                        run_anomalies, extreme_anomalies, webgl, max_points, export_mode,
+                                        interval)
+    shared = export_mode == "shared"
+
+    # Prepare HTML export
+    os.makedirs("plots", exist_ok=True)
+    output_path = f"plots/{ticker.lower()}_anomaly_chart.html"
+
+    # Write HTML with embedded JS, auto-open. Shared mode writes plotly.min.js once
+    # into plots/ and every chart references it instead of embedding its own copy.
+    with span("html_write", ticker=ticker, mode=export_mode):
+        fig.write_html(
+            output_path,
+            include_plotlyjs="directory" if shared else True,
+            full_html=True,
+            auto_open=auto_open,
+            post_script=post_script
+        )
+
+    print(f"✅ Chart saved{' & opened' if auto_open else ''}: {output_path}")
+    return fig
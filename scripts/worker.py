@@ -0,0 +1,317 @@
+import argparse
+import importlib
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import time
+import traceback
+
+# Commands a worker can run, each a module with main(argv)
+COMMANDS = {
+    "main": "scripts.main",
+    "batch": "scripts.batch",
+    "panel": "scripts.panel",
+    "sweep": "scripts.sweep",
+    "streaming": "scripts.streaming",
+    "benchmark": "scripts.benchmark",
+}
+# Loaded once by the worker so forked runs start with them in memory
+PRELOAD = ("numpy", "pandas", "plotly.graph_objects", "yfinance", "requests", "dotenv")
+SOCKET_NAME = "stock-anomaly-worker.sock"
+# The only client environment variables a run sees (API keys, display and
+# locale, proxies); everything else comes from the worker's own environment
+ENV_KEYS = (
+    "NEWSAPI_KEY", "NEWSDATA_API_KEY", "ANOMALY_HEADLESS", "DISPLAY", "WAYLAND_DISPLAY",
+    "TZ", "LANG", "LC_ALL", "LC_CTYPE", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY",
+    "http_proxy", "https_proxy", "no_proxy", "REQUESTS_CA_BUNDLE", "SSL_CERT_FILE",
+)
+
+
+def _is_private(path):
+    # A directory only the current user can enter or write to
+    st = os.lstat(path)
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def socket_path():
+    """
+    Default socket location: $XDG_RUNTIME_DIR, or a 0700 directory of our own
+    in the temp dir. Raises PermissionError if that directory exists but is
+    not private.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime) and _is_private(runtime):
+        return os.path.join(runtime, SOCKET_NAME)
+    directory = os.path.join(tempfile.gettempdir(), f"stock-anomaly-worker-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return os.path.join(directory, SOCKET_NAME)
+
+
+def _check_private(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    if not _is_private(directory):
+        raise PermissionError(f"{directory} must be a directory owned by you with mode 0700")
+
+
+def _peer_uid(sock, path=None):
+    # uid of the process at the other end; the socket file's owner where SO_PEERCRED is missing
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        return struct.unpack("3i", creds)[1]
+    return os.stat(path).st_uid if path else None
+
+
+def _warm():
+    # Import the libraries and every command module, and build one figure so
+    # plotly's lazily loaded validators are in memory too
+    for name in PRELOAD + tuple(COMMANDS.values()):
+        importlib.import_module(name)
+    import plotly.graph_objects as go
+    go.Figure(go.Scatter(x=[0, 1], y=[0, 1])).to_dict()
+
+
+def _run_command(command, argv):
+    """Run COMMANDS[command].main(argv) and return its exit code."""
+    try:
+        module = importlib.import_module(COMMANDS[command])
+        sys.argv = [module.__file__] + list(argv)
+        return module.main(argv) or 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+def _recv_request(conn):
+    # Header is one JSON line sent along with the client's stdin/stdout/stderr
+    data, fds, _, _ = socket.recv_fds(conn, 1 << 16, 3)
+    while data and not data.endswith(b"\n"):
+        chunk = conn.recv(1 << 16)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data), fds
+
+
+def _child(conn, request, fds):
+    # Runs in the forked process: take over the client's terminal, cwd and environment
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, "w", closefd=False, buffering=1)
+    sys.stderr = open(2, "w", closefd=False, buffering=1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    os.chdir(request["cwd"])
+    for key in ENV_KEYS:
+        if key in request["env"]:
+            os.environ[key] = request["env"][key]
+        else:
+            os.environ.pop(key, None)
+
+    code = _run_command(request["command"], request["argv"])
+    sys.stdout.flush()
+    sys.stderr.flush()
+    conn.sendall(json.dumps({"code": code}).encode() + b"\n")
+    os._exit(code)
+
+
+def serve(path=None):
+    """
+    Keep the heavy libraries loaded and run each client request in a fork.
+
+    Listens on a unix socket in a directory only the current user can open
+    (see socket_path()) and serves only peers with the same uid. Every
+    request is served by a forked copy of this process, so runs start with
+    pandas, yfinance and plotly already imported and cannot affect each other.
+    """
+    try:
+        path = path or socket_path()
+        _check_private(path)
+    except PermissionError as e:
+        print(f"❌ {e}")
+        return 1
+    if os.path.exists(path):
+        try:
+            with socket.socket(socket.AF_UNIX) as probe:
+                probe.connect(path)
+            print(f"❌ A worker is already listening on {path}")
+            return 1
+        except OSError:
+            os.unlink(path)  # left behind by a worker that was killed
+
+    started = time.perf_counter()
+    _warm()
+    print(f"🔥 Libraries loaded in {time.perf_counter() - started:.2f}s")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # reap finished runs automatically
+    print(f"✅ Worker listening on {path} (pid {os.getpid()})")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            if _peer_uid(conn) not in (None, os.getuid()):
+                conn.close()
+                continue
+            try:
+                request, fds = _recv_request(conn)
+            except (OSError, ValueError):
+                conn.close()
+                continue
+            if request.get("command") == "stop":
+                conn.sendall(b'{"code": 0}\n')
+                conn.close()
+                break
+            if request.get("command") not in COMMANDS:
+                conn.sendall(json.dumps({"code": 2, "error": f"unknown command {request.get('command')!r}"}).encode() + b"\n")
+            else:
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        server.close()
+                        _child(conn, request, fds)
+                    finally:
+                        os._exit(1)  # never fall back into the accept loop
+                conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+    print("👋 Worker stopped")
+    return 0
+
+
+def _send(command, argv=(), path=None):
+    # Connect, hand over our stdio and return the socket. Raises PermissionError
+    # if the socket is not private to us, other OSErrors if no worker listens.
+    path = path or socket_path()
+    _check_private(path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        if _peer_uid(client, path) != os.getuid():
+            raise PermissionError(f"{path} is served by another user")
+        env = {key: os.environ[key] for key in ENV_KEYS if key in os.environ}
+        header = {"command": command, "argv": list(argv), "cwd": os.getcwd(), "env": env}
+        sys.stdout.flush()
+        sys.stderr.flush()
+        socket.send_fds(client, [json.dumps(header).encode() + b"\n"], [0, 1, 2])
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+def _replies(client):
+    # Yield the worker's JSON replies; Ctrl-C while waiting is reported as None
+    buffer = b""
+    while True:
+        try:
+            chunk = client.recv(4096)
+        except KeyboardInterrupt:
+            yield None
+            continue
+        if not chunk:
+            return
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            yield json.loads(line)
+
+
+def run(command, argv=(), path=None):
+    """
+    Run a command in the worker, or in this process if no worker is running.
+
+    The worker writes straight to this terminal; Ctrl-C is forwarded to the run.
+
+    Returns:
+        The command's exit code.
+    """
+    if command not in COMMANDS:
+        print(f"❌ Unknown command {command!r}; choose from {sorted(COMMANDS)}")
+        return 2
+    try:
+        client = _send(command, argv, path)
+    except PermissionError as e:
+        print(f"❌ Refusing to use the worker: {e}")
+        return 1
+    except OSError:
+        print("ℹ️ No worker running, starting in this process")
+        return _run_command(command, list(argv))
+
+    pid, code = None, 1
+    with client:
+        for reply in _replies(client):
+            if reply is None:
+                if pid:
+                    os.kill(pid, signal.SIGINT)
+                continue
+            if "error" in reply:
+                print(f"❌ {reply['error']}")
+            pid = reply.get("pid", pid)
+            code = reply.get("code", code)
+    return code
+
+
+def stop(path=None):
+    try:
+        with _send("stop", path=path) as client:
+            client.recv(64)
+    except PermissionError as e:
+        print(f"❌ Refusing to use the worker: {e}")
+        return 1
+    except OSError:
+        print("ℹ️ No worker running")
+        return 1
+    print("✅ Worker stopped")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent worker that keeps pandas, yfinance and plotly loaded between runs.")
+    parser.add_argument("--socket", default=None,
+                        help="Unix socket path, in a directory only you can access (default: see socket_path())")
+    sub = parser.add_subparsers(dest="action", required=True)
+    sub.add_parser("serve", help="Load the libraries and wait for runs")
+    run_parser = sub.add_parser("run", help="Run a command in the worker")
+    run_parser.add_argument("command", help=f"One of {', '.join(COMMANDS)}")
+    run_parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command")
+    sub.add_parser("stop", help="Stop a running worker")
+    args = parser.parse_args(argv)
+
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"):
+        print("❌ The worker needs a POSIX system (unix sockets and fork)")
+        return 1
+    if args.action == "serve":
+        return serve(args.socket)
+    if args.action == "stop":
+        return stop(args.socket)
+    return run(args.command, args.args, args.socket)
+
+
+if __name__ == "__main__":
+    sys.exit(main())